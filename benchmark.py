@@ -0,0 +1,365 @@
+"""Benchmarks for the probe, crop, subtitle, transcription and render paths.
+
+Synthetic inputs are generated offline with ffmpeg (`testsrc` video and a `sine`
+tone) at each requested resolution and duration. Every benchmark runs a few
+times and the timings are written as JSON, so runs from different commits can
+be compared:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --sizes 640x360,1920x1080 --durations 10,60 --repeat 5
+
+Transcription uses a stub Whisper model by default so the numbers measure this
+code rather than Whisper; pass --whisper-model tiny to run the real model.
+The benchmarks run in a temporary working directory, so they never touch the
+uploads, outputs or caches of a running instance.
+
+Cold start is measured in fresh interpreters, once per worker start method:
+the time to import the API module and start the first job worker, and the
+memory (RSS and PSS) of both processes. --startup-only skips everything else.
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent
+
+SRT_SEGMENT_COUNT = 2000
+STUB_SEGMENT_SECONDS = 2.5
+WORKER_START_METHODS = ("forkserver", "fork")
+
+# Run in a fresh interpreter for each startup measurement; prints one JSON line
+STARTUP_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {repo_dir!r})
+started = time.perf_counter()
+import main
+import_seconds = time.perf_counter() - started
+started = time.perf_counter()
+worker_pid = main.get_job_pool("render").submit(main.warm_up_worker).result()
+worker_start_seconds = time.perf_counter() - started
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "worker_start_seconds": worker_start_seconds,
+    "worker_pid": worker_pid,
+    "heavy_modules": sorted(name for name in ("torch", "whisper") if name in sys.modules),
+}}))
+sys.stdout.flush()
+input()
+main.shutdown_job_pools()
+"""
+
+
+class StubWhisperModel:
+    """Stands in for a Whisper model: one short segment every STUB_SEGMENT_SECONDS."""
+
+    def transcribe(self, audio, **options):
+        duration = len(audio) / 16000
+        segments = []
+        start = 0.0
+        while start < duration:
+            end = min(start + STUB_SEGMENT_SECONDS, duration)
+            segments.append({"id": len(segments), "start": start, "end": end, "text": f" Segment {len(segments) + 1}"})
+            start = end
+        return {
+            "text": "".join(segment["text"] for segment in segments),
+            "segments": segments,
+            "language": options.get("language") or "en"
+        }
+
+
+def generate_media(path: Path, width: int, height: int, duration: float, fps: int = 30):
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={fps}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-shortest",
+        str(path)
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def synthetic_segments(count: int) -> list:
+    return [
+        {"id": i, "start": i * STUB_SEGMENT_SECONDS, "end": (i + 1) * STUB_SEGMENT_SECONDS, "text": f" Line {i + 1} of the subtitles"}
+        for i in range(count)
+    ]
+
+
+def segments_to_srt(main, segments: list) -> str:
+    return "".join(
+        f"{i}\n{main.format_timestamp(segment['start'])} --> {main.format_timestamp(segment['end'])}\n{segment['text'].strip()}\n\n"
+        for i, segment in enumerate(segments, 1)
+    )
+
+
+def clear_directory(directory: Path):
+    for path in directory.iterdir():
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """Time `func` `repeat` times (after `setup`, which is not timed)."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return summarize(runs)
+
+
+def summarize(runs: list) -> dict:
+    return {
+        "runs": [round(run, 6) for run in runs],
+        "min": round(min(runs), 6),
+        "median": round(statistics.median(runs), 6),
+        "mean": round(statistics.mean(runs), 6),
+    }
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    ffmpeg_version = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True).stdout.split("\n")[0]
+    return {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": ffmpeg_version,
+    }
+
+
+def process_memory(pid: int) -> dict:
+    """RSS and PSS of a process in bytes (PSS splits shared pages between their users)."""
+    memory = {}
+    for path, field, key in ((f"/proc/{pid}/status", "VmRSS:", "rss"), (f"/proc/{pid}/smaps_rollup", "Pss:", "pss")):
+        try:
+            with open(path) as f:
+                line = next(line for line in f if line.startswith(field))
+            memory[key] = int(line.split()[1]) * 1024
+        except (OSError, StopIteration):
+            memory[key] = None
+    return memory
+
+
+def measure_startup(start_method: str) -> dict:
+    """Import the app and start one job worker in a fresh interpreter."""
+    env = {**os.environ, "WORKER_START_METHOD": start_method, "JANITOR_INTERVAL": "0"}
+    process = subprocess.Popen(
+        [sys.executable, "-c", STARTUP_SCRIPT.format(repo_dir=str(REPO_DIR))],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env
+    )
+    try:
+        # Skip anything the app itself prints before the report
+        line = next((line for line in process.stdout if line.startswith("{")), None)
+        if line is None:
+            raise RuntimeError(f"Startup benchmark ({start_method}) exited with {process.wait()}")
+        result = json.loads(line)
+        # Both processes are still alive (the script waits for input) while we read their memory
+        result["api_memory"] = process_memory(process.pid)
+        result["worker_memory"] = process_memory(result.pop("worker_pid"))
+        process.communicate("\n", timeout=60)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return result
+
+
+def run_startup_benchmarks(repeat: int, record):
+    for start_method in WORKER_START_METHODS:
+        samples = [measure_startup(start_method) for _ in range(repeat)]
+        media = {"worker_start_method": start_method}
+        for name in ("import_seconds", "worker_start_seconds"):
+            record(f"startup_{name.removesuffix('_seconds')}", summarize([sample[name] for sample in samples]), media)
+        last = samples[-1]
+        record("startup_memory", {
+            "heavy_modules_in_api": last["heavy_modules"],
+            **{f"api_{key}": value for key, value in last["api_memory"].items()},
+            **{f"worker_{key}": value for key, value in last["worker_memory"].items()},
+        }, media)
+
+
+def wait_for_job(client, job_id: str, timeout: float = 3600) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed", "cancelled"):
+            if job["status"] != "done":
+                raise RuntimeError(f"Job {job_id} {job['status']}: {job['error']}")
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} did not finish within {timeout}s")
+
+
+def run_benchmarks(args) -> dict:
+    workspace = Path(tempfile.mkdtemp(prefix="video-editor-bench-"))
+    for name in ("static", "templates"):
+        os.symlink(REPO_DIR / name, workspace / name)
+    os.chdir(workspace)
+    os.environ.setdefault("JANITOR_INTERVAL", "0")
+    sys.path.insert(0, str(REPO_DIR))
+
+    results = []
+
+    def record(name: str, timing: dict, media: dict = None):
+        results.append({"name": name, "media": media, **timing})
+        if "median" in timing:
+            print(f"{name} {media or ''}: median {timing['median']:.4f}s", file=sys.stderr)
+
+    try:
+        run_startup_benchmarks(args.repeat, record)
+        if not args.startup_only:
+            run_media_benchmarks(args, workspace, record)
+    finally:
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    return {
+        "environment": environment_info(),
+        "settings": {
+            "sizes": [f"{width}x{height}" for width, height in args.sizes],
+            "durations": args.durations,
+            "repeat": args.repeat,
+            "profile": args.profile,
+            "whisper_model": args.whisper_model or "stub",
+        },
+        "results": results,
+    }
+
+
+def run_media_benchmarks(args, workspace: Path, record):
+    # The Whisper stubs below are patched into this process, so the job workers
+    # must be forked from it rather than started from the fork server
+    os.environ["WORKER_START_METHOD"] = "fork"
+
+    import main
+    from fastapi.testclient import TestClient
+
+    if not args.whisper_model:
+        # Patched before the job pools fork, so workers use the stub as well
+        main.get_whisper_model = lambda model_name=None: StubWhisperModel()
+        main.transcribe_with_progress = lambda model, audio, **options: model.transcribe(audio, **options)
+
+    def clear_caches():
+        main.media_info_cache.clear()
+        main.file_hashes.clear()
+        main.preview_cache.clear()
+        for directory in (main.PROBE_CACHE_DIR, main.TRANSCRIPTION_CACHE_DIR, main.AUDIO_CACHE_DIR, main.RENDER_CACHE_DIR):
+            clear_directory(directory)
+
+    segments = synthetic_segments(SRT_SEGMENT_COUNT)
+    srt_path = main.TRANSCRIPTS_DIR / "benchmark.srt"
+    record("create_srt_file", measure(lambda: main.create_srt_file(segments, srt_path), args.repeat * 10))
+
+    with TestClient(main.app) as client:
+        for width, height in args.sizes:
+            for duration in args.durations:
+                media = {"width": width, "height": height, "duration": duration}
+                input_path = workspace / f"input_{width}x{height}_{duration}s.mp4"
+                generate_media(input_path, width, height, duration)
+                output_path = str(main.OUTPUT_DIR / "benchmark.mp4")
+                srt_content = segments_to_srt(main, synthetic_segments(int(duration / STUB_SEGMENT_SECONDS) + 1))
+
+                record("get_video_dimensions", measure(
+                    lambda: main.get_video_dimensions(str(input_path)), args.repeat, setup=clear_caches
+                ), media)
+                record("crop_video", measure(
+                    lambda: main.crop_video(str(input_path), output_path, "9:16", 50, profile=args.profile),
+                    args.repeat
+                ), media)
+                record("crop_video_burn_subtitles", measure(
+                    lambda: main.crop_video(
+                        str(input_path), output_path, "9:16", 50, language="english", burn_subtitles=True,
+                        subtitle_styles={"srt_content": srt_content}, profile=args.profile
+                    ),
+                    args.repeat
+                ), media)
+                record("transcribe_audio", measure(
+                    lambda: main.transcribe_audio(str(input_path), "english", args.whisper_model),
+                    args.repeat, setup=clear_caches
+                ), media)
+
+                upload_timings = []
+
+                def upload_and_render():
+                    with open(input_path, "rb") as f:
+                        started = time.perf_counter()
+                        upload = client.post("/upload", files={"file": (input_path.name, f, "video/mp4")})
+                        upload_timings.append(time.perf_counter() - started)
+                    upload.raise_for_status()
+                    response = client.post(f"/render/{upload.json()['file_id']}", json={
+                        "target_ratio": "9:16",
+                        "position": 50,
+                        "language": "english",
+                        "skip_edit": True,
+                        "model": args.whisper_model,
+                        "profile": args.profile,
+                    })
+                    response.raise_for_status()
+                    wait_for_job(client, response.json()["job_id"])
+
+                timing = measure(upload_and_render, args.repeat, setup=clear_caches)
+                timing["upload_median"] = round(statistics.median(upload_timings), 6)
+                record("upload_render", timing, media)
+
+                input_path.unlink()
+
+
+def parse_sizes(value: str) -> list:
+    return [tuple(int(part) for part in size.split("x")) for size in value.split(",")]
+
+
+def parse_durations(value: str) -> list:
+    return [float(duration) for duration in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=parse_sizes, default=parse_sizes("640x360,1280x720,1920x1080"),
+                        help="comma-separated WIDTHxHEIGHT list (default: %(default)s)")
+    parser.add_argument("--durations", type=parse_durations, default=parse_durations("10,30"),
+                        help="comma-separated durations in seconds (default: 10,30)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark (default: %(default)s)")
+    parser.add_argument("--profile", default="standard", help="encoding profile (default: %(default)s)")
+    parser.add_argument("--whisper-model", default=None, help="real Whisper model to use instead of the stub")
+    parser.add_argument("--startup-only", action="store_true", help="only measure cold start and memory")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # The app logs and prints freely; keep stdout for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(args)
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(report_json + "\n", encoding="utf-8")
+    else:
+        print(report_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,40 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Body
-from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import os
+import io
+import json
+import math
+import hashlib
+import re
+import sys
+import time
+import threading
+import multiprocessing
+import multiprocessing.managers
+import multiprocessing.util
+import signal
+import fcntl
 import subprocess
 import uuid
 from pathlib import Path
 import shutil
+import sqlite3
 import logging
+import mimetypes
+from email.utils import formatdate
+from urllib.parse import quote
 from typing import Optional
-import whisper
+from collections import OrderedDict, deque
+from bisect import bisect_left, bisect_right
+from contextlib import closing, contextmanager
+from types import SimpleNamespace
+import numpy as np
 import datetime
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,9 +46,160 @@ app = FastAPI(title="Video Cropper")
 UPLOAD_DIR = Path("uploads")
 OUTPUT_DIR = Path("outputs")
 TRANSCRIPTS_DIR = Path("transcripts")
+PARTIAL_UPLOAD_DIR = UPLOAD_DIR / "partial"
+CACHE_DIR = Path("cache")
+TRANSCRIPTION_CACHE_DIR = CACHE_DIR / "transcriptions"
+AUDIO_CACHE_DIR = CACHE_DIR / "audio"
+PROBE_CACHE_DIR = CACHE_DIR / "probes"
+RENDER_CACHE_DIR = CACHE_DIR / "renders"
+SUBJECT_CACHE_DIR = CACHE_DIR / "subjects"
+SEGMENT_CACHE_DIR = CACHE_DIR / "segments"
+# Registry of uploads (see "Upload registry" below)
+UPLOAD_DB_PATH = Path(os.environ.get("UPLOAD_DB_PATH", UPLOAD_DIR / "uploads.db"))
+
+# Storage janitor (see "Storage janitor" below). TTLs are measured from the last
+# use of a file; 0 disables a TTL. STORAGE_MAX_BYTES caps uploads, outputs and
+# transcripts together, evicting least recently used files first.
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", 24 * 3600))
+OUTPUT_TTL_SECONDS = int(os.environ.get("OUTPUT_TTL_SECONDS", 24 * 3600))
+TRANSCRIPT_TTL_SECONDS = int(os.environ.get("TRANSCRIPT_TTL_SECONDS", 24 * 3600))
+TEMP_FILE_TTL_SECONDS = int(os.environ.get("TEMP_FILE_TTL_SECONDS", 6 * 3600))
+STORAGE_MAX_BYTES = int(os.environ.get("STORAGE_MAX_BYTES", 50 * 1024 * 1024 * 1024))
+JANITOR_INTERVAL = float(os.environ.get("JANITOR_INTERVAL", 300))
+
+# Uploads are streamed to disk in chunks of this size, so memory use per
+# upload stays constant regardless of the file size.
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# Downloads and live render streams are sent in chunks of this size
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 256 * 1024))
+
+# Job queue configuration. libx264 is already multi-threaded, so by default we
+# run one render per four cores; Whisper on CPU uses every core it can get.
+RENDER_WORKERS = int(os.environ.get("RENDER_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+TRANSCRIBE_WORKERS = int(os.environ.get("TRANSCRIBE_WORKERS", 1))
+MAX_FINISHED_JOBS = int(os.environ.get("MAX_FINISHED_JOBS", 500))
+# How job workers are started. "forkserver" forks them from a server process
+# that imports worker.py (Whisper, torch and this module) once, so the API
+# process never loads them; "fork" forks them from the API process, and each
+# worker then imports Whisper on first use.
+WORKER_START_METHOD = os.environ.get("WORKER_START_METHOD", "forkserver")
+
+# Admission control (see "Admission control" below). Jobs are costed from their
+# probe in worker seconds: RENDER_COST_FACTOR is the cost of one second of
+# 1080p30 video with the "standard" profile, TRANSCRIBE_COST_FACTOR that of one
+# second of audio with the "medium" model. Each job kind may have at most
+# ADMISSION_MAX_BACKLOG seconds of estimated work per worker queued or running,
+# a single client at most ADMISSION_CLIENT_SHARE of that; beyond it requests get
+# a 429. Jobs only start while the estimated memory of running jobs stays
+# within ADMISSION_MEMORY_MB. 0 disables a limit. Clients are told apart by
+# their address, or by the ADMISSION_CLIENT_HEADER request header when set
+# (e.g. "X-Forwarded-For" behind a proxy).
+RENDER_COST_FACTOR = float(os.environ.get("RENDER_COST_FACTOR", 1.0))
+TRANSCRIBE_COST_FACTOR = float(os.environ.get("TRANSCRIBE_COST_FACTOR", 1.0))
+ADMISSION_MAX_BACKLOG = float(os.environ.get("ADMISSION_MAX_BACKLOG", 3600))
+ADMISSION_CLIENT_SHARE = float(os.environ.get("ADMISSION_CLIENT_SHARE", 0.5))
+ADMISSION_MEMORY_MB = int(os.environ.get(
+    "ADMISSION_MEMORY_MB",
+    os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") * 3 // 4 // (1024 * 1024)
+))
+ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER", "")
+
+# How often the job event stream checks for progress, and how long it may stay
+# silent before sending a keep-alive comment (so proxies don't time it out)
+JOB_EVENT_INTERVAL = float(os.environ.get("JOB_EVENT_INTERVAL", 0.5))
+JOB_EVENT_KEEPALIVE = float(os.environ.get("JOB_EVENT_KEEPALIVE", 15))
+# Jobs submitted with cancel_on_disconnect are cancelled once no client has
+# followed them (event stream, live stream or polling) for this many seconds
+JOB_DISCONNECT_GRACE = float(os.environ.get("JOB_DISCONNECT_GRACE", 10))
+# Default of cancel_on_disconnect for /crop, /render and /render-batch
+JOB_CANCEL_ON_DISCONNECT = os.environ.get("JOB_CANCEL_ON_DISCONNECT", "1") == "1"
+
+# Time limits for ffmpeg, ffprobe and Whisper (0 disables a limit). ffprobe and
+# previews get a fixed time; encodes, audio extraction, subject analysis and
+# transcription may take STAGE_TIMEOUT_FACTOR times the media duration, but
+# never less than STAGE_MIN_TIMEOUT. An ffmpeg that produces no output for
+# FFMPEG_STALL_TIMEOUT seconds is killed either way.
+FFPROBE_TIMEOUT = float(os.environ.get("FFPROBE_TIMEOUT", 60))
+PREVIEW_TIMEOUT = float(os.environ.get("PREVIEW_TIMEOUT", 60))
+STAGE_TIMEOUT_FACTOR = float(os.environ.get("STAGE_TIMEOUT_FACTOR", 30))
+STAGE_MIN_TIMEOUT = float(os.environ.get("STAGE_MIN_TIMEOUT", 600))
+FFMPEG_STALL_TIMEOUT = float(os.environ.get("FFMPEG_STALL_TIMEOUT", 120))
+# Only the last lines of a tool's stderr are kept, for error reports
+STDERR_TAIL_LINES = int(os.environ.get("STDERR_TAIL_LINES", 200))
+
+# Transcription results are cached on disk; least recently used entries are
+# evicted once the cache grows beyond this many bytes.
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPTION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Extracted 16 kHz mono audio tracks (about 230 MB per hour of audio)
+AUDIO_CACHE_MAX_BYTES = int(os.environ.get("AUDIO_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Encoding profiles selectable per render. `max_height` downscales the cropped
+# video; ENCODER_THREADS caps the threads each ffmpeg encode uses (0 = auto).
+ENCODING_PROFILES = {
+    "preview": {"preset": "ultrafast", "crf": 30, "max_height": 480, "audio_bitrate": "96k"},
+    "standard": {"preset": "medium", "crf": 23, "max_height": None, "audio_bitrate": "192k"},
+    "archive": {"preset": "slow", "crf": 23, "max_height": None, "audio_bitrate": "192k"},
+}
+DEFAULT_ENCODING_PROFILE = os.environ.get("ENCODING_PROFILE", "standard")
+ENCODER_THREADS = int(os.environ.get("ENCODER_THREADS", 0))
+
+# Segment-parallel rendering: with RENDER_PARALLEL=1, sources are split at
+# keyframes into segments of about RENDER_SEGMENT_SECONDS that are encoded by
+# RENDER_SEGMENT_WORKERS processes and concatenated without re-encoding.
+RENDER_PARALLEL = os.environ.get("RENDER_PARALLEL", "0") == "1"
+RENDER_SEGMENT_SECONDS = int(os.environ.get("RENDER_SEGMENT_SECONDS", 60))
+RENDER_SEGMENT_WORKERS = int(os.environ.get("RENDER_SEGMENT_WORKERS", max(1, (os.cpu_count() or 1) // 4)))
+
+# Incremental renders: renders with burned-in subtitles keep their segments of
+# about RENDER_INCREMENTAL_SEGMENT_SECONDS in cache/segments, so re-rendering
+# with edited subtitles only re-encodes the segments whose cues changed.
+RENDER_INCREMENTAL = os.environ.get("RENDER_INCREMENTAL", "0") == "1"
+RENDER_INCREMENTAL_SEGMENT_SECONDS = int(os.environ.get("RENDER_INCREMENTAL_SEGMENT_SECONDS", 20))
+SEGMENT_CACHE_MAX_BYTES = int(os.environ.get("SEGMENT_CACHE_MAX_BYTES", 20 * 1024 * 1024 * 1024))
+
+# Finished renders are kept as content-addressed outputs (render_<key>.mp4) so an
+# identical render is served without re-encoding; LRU-evicted past this budget.
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_BYTES", 10 * 1024 * 1024 * 1024))
+# Bump when a code change alters render output, to invalidate cached renders
+RENDER_CACHE_VERSION = 1
+
+# Maximum number of output specs a single batch render may encode
+RENDER_BATCH_MAX_OUTPUTS = int(os.environ.get("RENDER_BATCH_MAX_OUTPUTS", 8))
+
+# Previews: cropped frames, filmstrips and short low-resolution clips, kept in an
+# in-memory LRU cache of PREVIEW_CACHE_MAX_BYTES
+PREVIEW_HEIGHT = int(os.environ.get("PREVIEW_HEIGHT", 360))
+PREVIEW_FILMSTRIP_HEIGHT = int(os.environ.get("PREVIEW_FILMSTRIP_HEIGHT", 180))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get("PREVIEW_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+# Previews run in the API process, at most this many at once
+PREVIEW_CONCURRENCY = int(os.environ.get("PREVIEW_CONCURRENCY", 2))
+PREVIEW_MAX_FRAMES = 12
+PREVIEW_MAX_CLIP_SECONDS = 10
+
+# Probe results (stream metadata and keyframe index) of uploaded files
+PROBE_CACHE_MAX_BYTES = int(os.environ.get("PROBE_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Subject-tracking crop (auto_crop): frames are sampled at AUTO_CROP_SAMPLE_FPS,
+# AUTO_CROP_ANALYSIS_WIDTH pixels wide. The crop path is smoothed over
+# AUTO_CROP_SMOOTHING_SECONDS and restarts at scene cuts, detected when the
+# luma histograms of consecutive samples differ by more than AUTO_CROP_SCENE_THRESHOLD.
+AUTO_CROP_SAMPLE_FPS = float(os.environ.get("AUTO_CROP_SAMPLE_FPS", 2))
+AUTO_CROP_ANALYSIS_WIDTH = int(os.environ.get("AUTO_CROP_ANALYSIS_WIDTH", 160))
+AUTO_CROP_SMOOTHING_SECONDS = float(os.environ.get("AUTO_CROP_SMOOTHING_SECONDS", 2))
+AUTO_CROP_SCENE_THRESHOLD = float(os.environ.get("AUTO_CROP_SCENE_THRESHOLD", 0.4))
+# Upper bound on the linear pieces of one crop path (it becomes an ffmpeg expression)
+AUTO_CROP_MAX_POINTS = int(os.environ.get("AUTO_CROP_MAX_POINTS", 400))
+SUBJECT_CACHE_MAX_BYTES = int(os.environ.get("SUBJECT_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Parallel transcription: long audio is split at silences into chunks of about
+# TRANSCRIBE_CHUNK_SECONDS and transcribed by TRANSCRIBE_CHUNK_WORKERS processes.
+TRANSCRIBE_PARALLEL = os.environ.get("TRANSCRIBE_PARALLEL", "0") == "1"
+TRANSCRIBE_CHUNK_SECONDS = int(os.environ.get("TRANSCRIBE_CHUNK_SECONDS", 300))
+TRANSCRIBE_CHUNK_WORKERS = int(os.environ.get("TRANSCRIBE_CHUNK_WORKERS", max(1, (os.cpu_count() or 1) // 2)))
 
 # Create directories with proper permissions
-for directory in [UPLOAD_DIR, OUTPUT_DIR, TRANSCRIPTS_DIR]:
+for directory in [UPLOAD_DIR, OUTPUT_DIR, TRANSCRIPTS_DIR, PARTIAL_UPLOAD_DIR, CACHE_DIR, TRANSCRIPTION_CACHE_DIR, AUDIO_CACHE_DIR, PROBE_CACHE_DIR, RENDER_CACHE_DIR, SUBJECT_CACHE_DIR, SEGMENT_CACHE_DIR]:
     try:
         directory.mkdir(exist_ok=True)
         # Ensure directory is writable
@@ -42,14 +217,197 @@ for directory in [UPLOAD_DIR, OUTPUT_DIR, TRANSCRIPTS_DIR]:
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Initialize Whisper model
-whisper_model = None
+# Whisper model registry
+#
+# Each worker process keeps up to WHISPER_MODEL_MEMORY_MB worth of models
+# resident, evicting the least recently used one when a new size is requested.
+WHISPER_MODELS = ["tiny", "base", "small", "medium"]
+WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL", "medium")
+WHISPER_MODEL_MEMORY_MB = int(os.environ.get("WHISPER_MODEL_MEMORY_MB", 4096))
+WHISPER_PRELOAD_MODELS = [
+    name.strip() for name in os.environ.get("WHISPER_PRELOAD_MODELS", "").split(",") if name.strip()
+]
+
+# Approximate resident size of each model's fp32 weights, used before loading
+WHISPER_MODEL_SIZES_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3060,
+}
+
+whisper_models = OrderedDict()
+
+def get_model_memory_mb(model) -> int:
+    return sum(p.numel() * p.element_size() for p in model.parameters()) // (1024 * 1024)
+
+def get_whisper_model(model_name: Optional[str] = None):
+    """Return a resident Whisper model, loading (and evicting) as needed."""
+    model_name = model_name or WHISPER_MODEL_NAME
+    if model_name not in WHISPER_MODELS:
+        raise ValueError(f"Unknown Whisper model: {model_name}")
+    
+    if model_name in whisper_models:
+        whisper_models.move_to_end(model_name)
+        return whisper_models[model_name][0]
+    
+    # Make room for the new model before loading it
+    needed_mb = WHISPER_MODEL_SIZES_MB[model_name]
+    while whisper_models and sum(size for _, size in whisper_models.values()) + needed_mb > WHISPER_MODEL_MEMORY_MB:
+        evicted_name, _ = whisper_models.popitem(last=False)
+        logger.info(f"Evicted Whisper model: {evicted_name}")
+    
+    logger.info(f"Loading Whisper model: {model_name}")
+    # Imported here so the API process never loads Whisper (and torch); workers
+    # started from the fork server already have it preloaded by worker.py
+    import whisper
+    with timed("whisper_model_load_seconds", model=model_name):
+        model = whisper.load_model(model_name)
+    whisper_models[model_name] = (model, get_model_memory_mb(model))
+    return model
+
+def preload_whisper_models():
+    """Worker initializer: load the configured models before the first request."""
+    for model_name in WHISPER_PRELOAD_MODELS:
+        try:
+            get_whisper_model(model_name)
+        except Exception as e:
+            logger.error(f"Failed to preload Whisper model {model_name}: {e}")
+
+# Content hashes, memoized per (path, size, mtime) so a file is read only once
+file_hashes = {}
 
-def get_whisper_model():
-    global whisper_model
-    if whisper_model is None:
-        whisper_model = whisper.load_model("medium")
-    return whisper_model
+def get_file_hash(file_path: str) -> str:
+    """Return the SHA-256 of a file's contents."""
+    stat = os.stat(file_path)
+    key = (str(file_path), stat.st_size, stat.st_mtime_ns)
+    if key not in file_hashes:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+        file_hashes[key] = digest.hexdigest()
+    return file_hashes[key]
+
+def remember_file_hash(file_path: str, content_hash: str):
+    """Seed the hash memo for a file whose hash was computed while writing it."""
+    stat = os.stat(file_path)
+    file_hashes[(str(file_path), stat.st_size, stat.st_mtime_ns)] = content_hash
+
+def get_transcription_cache_path(content_hash: str, language: Optional[str], model_name: str, start: Optional[float] = None, end: Optional[float] = None) -> Path:
+    clip = f"_{start or 0:.3f}-{'end' if end is None else f'{end:.3f}'}" if start or end is not None else ""
+    return TRANSCRIPTION_CACHE_DIR / f"{content_hash}_{language or 'auto'}_{model_name}{clip}.json"
+
+def load_cached_json(cache_path: Path) -> Optional[dict]:
+    """Return a cached JSON entry, or None on a miss."""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    # Bump the modification time so eviction keeps recently used entries
+    try:
+        cache_path.touch()
+    except FileNotFoundError:
+        pass
+    return result
+
+def evict_lru_cache(directory: Path, pattern: str, max_bytes: int, *more_patterns: str):
+    """Delete least recently used cache entries until the directory fits its budget.
+    
+    Entries are the files matching `pattern` or any of `more_patterns`.
+    """
+    entries = []
+    for path in (path for glob in (pattern, *more_patterns) for path in directory.glob(glob)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total_size -= size
+            logger.info(f"Evicted cache entry: {path}")
+        except FileNotFoundError:
+            pass
+
+def store_cached_json(cache_path: Path, data: dict) -> bool:
+    # Write to a temporary file first so other workers never read a partial entry
+    temp_path = cache_path.with_suffix(f".{uuid.uuid4()}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(temp_path, cache_path)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not write cache entry {cache_path}: {e}")
+        if temp_path.exists():
+            temp_path.unlink()
+        return False
+
+def store_cached_transcription(cache_path: Path, result: dict):
+    if store_cached_json(cache_path, result):
+        evict_lru_cache(TRANSCRIPTION_CACHE_DIR, "*.json", TRANSCRIPTION_CACHE_MAX_BYTES)
+
+# Audio extraction
+#
+# Whisper wants 16 kHz mono float32 samples. Decoding them from the original
+# container (video stream included) on every call is wasteful, so the audio track
+# is extracted once per upload into a raw float32 file and memory-mapped after.
+WHISPER_SAMPLE_RATE = 16000
+
+def extract_audio(input_path: str) -> Path:
+    """Extract the audio track to a cached raw 16 kHz mono float32 file."""
+    audio_path = AUDIO_CACHE_DIR / f"{get_file_hash(input_path)}.f32"
+    if audio_path.exists():
+        audio_path.touch()
+        return audio_path
+    
+    if not get_media_info(input_path)["has_audio"]:
+        raise HTTPException(status_code=400, detail="Video has no audio track to transcribe")
+    
+    temp_path = audio_path.with_suffix(f".{uuid.uuid4()}.tmp")
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-nostdin",
+        "-i", str(input_path),
+        "-map", "0:a:0",
+        "-vn",
+        "-ac", "1",
+        "-ar", str(WHISPER_SAMPLE_RATE),
+        "-f", "f32le",
+        str(temp_path)
+    ]
+    logger.info(f"Extracting audio: {' '.join(cmd)}")
+    result = run_ffmpeg(cmd, get_media_info(input_path)["duration"], "extracting_audio")
+    
+    if result.returncode != 0:
+        if temp_path.exists():
+            temp_path.unlink()
+        logger.error(f"Audio extraction failed: {result.stderr}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Could not extract audio from video: {result.stderr}"
+        )
+    
+    os.replace(temp_path, audio_path)
+    evict_lru_cache(AUDIO_CACHE_DIR, "*.f32", AUDIO_CACHE_MAX_BYTES)
+    return audio_path
+
+def load_audio_samples(input_path: str) -> np.ndarray:
+    """Return the upload's audio as a memory-mapped 16 kHz mono float32 array."""
+    audio_path = extract_audio(input_path)
+    if audio_path.stat().st_size == 0:
+        # Empty audio track; mmap cannot map a zero-length file
+        return np.zeros(0, dtype=np.float32)
+    # Copy-on-write mapping: torch needs a writable array, the cache file must stay intact
+    return np.memmap(audio_path, dtype=np.float32, mode='c')
 
 def format_timestamp(seconds):
     """Convert seconds to SRT timestamp format."""
@@ -70,6 +428,92 @@ def create_srt_file(segments, output_path):
             f.write(f"{segment['text'].strip()}\n\n")
     return output_path
 
+# Native SRT -> ASS conversion
+#
+# Timing follows what `ffmpeg -i subs.srt subs.ass` produces: start times and
+# durations are each rounded (half away from zero) from milliseconds to
+# centiseconds, and the end is start + duration.
+SRT_TIMING_RE = re.compile(
+    r"(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})\s*-->\s*(\d+):(\d{1,2}):(\d{1,2})[,.](\d{1,3})"
+)
+SRT_MARKUP_RE = re.compile(r"<(/?)(b|i|u|s)>|<font\s+color=\"?#?([0-9a-fA-F]{6})\"?\s*>|</font>", re.IGNORECASE)
+
+def seconds_to_millis(seconds: float) -> int:
+    """Whole milliseconds of a timestamp, truncated exactly as format_timestamp does."""
+    return int(seconds) * 1000 + int((seconds - int(seconds)) * 1000)
+
+def parse_srt(srt_content: str) -> list:
+    """Parse SRT text into (start_ms, end_ms, text) cues, sorted by start time."""
+    cues = []
+    for block in re.split(r"\n\s*\n", srt_content.replace('\r\n', '\n').replace('\r', '\n')):
+        lines = block.strip('\n').split('\n')
+        for i, line in enumerate(lines):
+            match = SRT_TIMING_RE.search(line)
+            if match:
+                h1, m1, s1, ms1, h2, m2, s2, ms2 = (int(value) for value in match.groups())
+                start = ((h1 * 60 + m1) * 60 + s1) * 1000 + ms1
+                end = ((h2 * 60 + m2) * 60 + s2) * 1000 + ms2
+                cues.append((start, end, '\n'.join(lines[i + 1:])))
+                break
+    cues.sort(key=lambda cue: cue[0])
+    return cues
+
+def segments_to_cues(segments) -> list:
+    """Turn Whisper segments into cues with the same timing create_srt_file writes."""
+    return [
+        (seconds_to_millis(segment['start']), seconds_to_millis(segment['end']), segment['text'].strip())
+        for segment in segments
+    ]
+
+def format_ass_timestamp(centiseconds: int) -> str:
+    """Convert centiseconds to ASS timestamp format (H:MM:SS.cc)."""
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def srt_text_to_ass(text: str) -> str:
+    """Convert SRT cue text (with basic HTML markup) to an ASS dialogue text field."""
+    def convert_tag(match):
+        closing, tag, color = match.groups()
+        if tag:
+            return f"{{\\{tag.lower()}{0 if closing else 1}}}"
+        if color:
+            # RGB to ASS BGR, without leading zeros like ffmpeg writes it
+            return f"{{\\c&H{int(color[4:6] + color[2:4] + color[0:2], 16):X}&}}"
+        return "{\\c}"
+    
+    lines = [line.rstrip() for line in text.strip().split('\n')]
+    return SRT_MARKUP_RE.sub(convert_tag, '\\N'.join(lines))
+
+# 9:59:59.99
+ASS_MAX_CENTISECONDS = 10 * 360000 - 1
+
+def create_ass_events(cues) -> str:
+    """Render cues as ASS Dialogue lines for the [Events] section."""
+    events = []
+    for i, (start, end, text) in enumerate(cues):
+        if end < start and i + 1 < len(cues):
+            # Negative duration: like ffmpeg, show the cue until the next one starts
+            end = cues[i + 1][0]
+        start_cs = (start + 5) // 10
+        # ...or, for the last cue, for good. Times are capped at the largest ASS timestamp.
+        end_cs = min(start_cs + (end - start + 5) // 10, ASS_MAX_CENTISECONDS) if end >= start else ASS_MAX_CENTISECONDS
+        start_cs = min(start_cs, ASS_MAX_CENTISECONDS)
+        events.append(
+            f"Dialogue: 0,{format_ass_timestamp(start_cs)},{format_ass_timestamp(end_cs)},"
+            f"Default,,0,0,0,,{srt_text_to_ass(text)}\n"
+        )
+    return ''.join(events)
+
+def shift_cues(cues, offset_ms: int) -> list:
+    """Move cues `offset_ms` earlier, dropping those that end before zero."""
+    return [
+        (max(start - offset_ms, 0), end - offset_ms, text)
+        for start, end, text in cues
+        if end - offset_ms > 0
+    ]
+
 def create_txt_file(segments, output_path):
     """Create plain text file from transcription segments."""
     with open(output_path, 'w', encoding='utf-8') as f:
@@ -77,35 +521,577 @@ def create_txt_file(segments, output_path):
             f.write(f"{segment['text'].strip()}\n")
     return output_path
 
-def transcribe_audio(input_path: str, language: Optional[str] = None):
-    """Transcribe audio using Whisper."""
-    model = get_whisper_model()
+# Metrics
+#
+# Counters, gauges and histograms kept in the API process and exposed in the
+# Prometheus text format on /metrics. Job workers forward their observations
+# over the progress queue, so time spent in a worker process is counted too.
+SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+RATIO_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10)
+FPS_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+THROUGHPUT_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.5, 1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+METRICS = {
+    "upload_bytes_total": ("counter", "Bytes received in uploads", None),
+    "upload_throughput_bytes_per_second": ("histogram", "Upload (or upload chunk) throughput", THROUGHPUT_BUCKETS),
+    "ffprobe_seconds": ("histogram", "Time spent probing media", SECONDS_BUCKETS),
+    "whisper_model_load_seconds": ("histogram", "Time to load a Whisper model", SECONDS_BUCKETS),
+    "transcription_seconds": ("histogram", "Time spent transcribing (cache misses)", SECONDS_BUCKETS),
+    "transcription_realtime_factor": ("histogram", "Transcription time divided by audio duration", RATIO_BUCKETS),
+    "transcription_cache_requests_total": ("counter", "Transcription cache lookups", None),
+    "subtitle_ass_seconds": ("histogram", "Time to convert subtitle cues to an ASS file", SECONDS_BUCKETS),
+    "ffmpeg_seconds": ("histogram", "Wall time of ffmpeg runs by stage", SECONDS_BUCKETS),
+    "render_encode_seconds": ("histogram", "Wall time of crop/encode runs", SECONDS_BUCKETS),
+    "render_encode_fps": ("histogram", "Source frames encoded per second", FPS_BUCKETS),
+    "render_encode_speed": ("histogram", "Media seconds encoded per wall-clock second", RATIO_BUCKETS),
+    "render_cache_requests_total": ("counter", "Render cache lookups", None),
+    "render_segments_total": ("counter", "Segments of incremental renders, encoded or reused", None),
+    "subject_analysis_seconds": ("histogram", "Time to analyze a video for subject-tracking crops", SECONDS_BUCKETS),
+    "job_wait_seconds": ("histogram", "Time jobs spent queued before running", SECONDS_BUCKETS),
+    "job_duration_seconds": ("histogram", "Time jobs spent running", SECONDS_BUCKETS),
+    "admission_requests_total": ("counter", "Job admission decisions", None),
+}
+
+metric_values = {name: {} for name in METRICS}
+metrics_lock = threading.Lock()
+forward_metrics = False
+
+def record_metric(name: str, value: float, **labels):
+    """Add to a counter or observe a histogram value, labeled by `labels`."""
+    labels = tuple(sorted((key, str(label)) for key, label in labels.items()))
+    if forward_metrics:
+        try:
+            progress_queue.put_nowait(("metric", name, value, labels))
+        except Exception:
+            pass
+        return
+    
+    kind, _, buckets = METRICS[name]
+    with metrics_lock:
+        values = metric_values[name]
+        if kind == "counter":
+            values[labels] = values.get(labels, 0) + value
+            return
+        if labels not in values:
+            values[labels] = {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0}
+        histogram = values[labels]
+        for index, bound in enumerate(buckets):
+            if value <= bound:
+                histogram["buckets"][index] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+@contextmanager
+def timed(name: str, **labels):
+    """Observe the wall time of the enclosed block in histogram `name`."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record_metric(name, time.monotonic() - started, **labels)
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in pairs) + "}"
+
+def format_metric_family(name: str, kind: str, help_text: str, samples: list) -> list:
+    """Render (labels, value) samples of a counter or gauge."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{format_labels(labels)} {value}" for labels, value in samples]
+    return lines
+
+def format_metrics() -> str:
+    lines = []
+    with metrics_lock:
+        for name, (kind, help_text, buckets) in METRICS.items():
+            values = metric_values[name]
+            if kind == "counter":
+                lines += format_metric_family(name, kind, help_text, sorted(values.items()))
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for labels, histogram in sorted(values.items()):
+                for bound, count in zip(buckets, histogram["buckets"]):
+                    lines.append(f"{name}_bucket{format_labels(labels, le=bound)} {count}")
+                lines.append(f"{name}_bucket{format_labels(labels, le='+Inf')} {histogram['count']}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram['count']}")
+    
+    # Job and storage gauges are read from live state at scrape time
+    job_list = list(jobs.values())
+    for name, status, help_text in (
+        ("job_queue_depth", "queued", "Jobs waiting for a worker"),
+        ("jobs_in_flight", "running", "Jobs currently running"),
+    ):
+        lines += format_metric_family(name, "gauge", help_text, [
+            ((("kind", kind),), sum(1 for job in job_list if job["kind"] == kind and job["status"] == status))
+            for kind in JOB_POOL_SIZES
+        ])
+    lines += format_metric_family("jobs_finished", "gauge", "Finished jobs still kept in the job table", [
+        ((("kind", kind), ("status", status)), sum(1 for job in job_list if job["kind"] == kind and job["status"] == status))
+        for kind in JOB_POOL_SIZES for status in FINISHED_JOB_STATUSES
+    ])
+    lines += format_metric_family("admission_backlog_seconds", "gauge", "Estimated worker seconds of admitted work left", [
+        ((("kind", kind),), round(admission_backlog(kind), 3)) for kind in JOB_POOL_SIZES
+    ])
+    lines += format_metric_family("admission_memory_mb", "gauge", "Estimated memory of running jobs", [
+        ((), round(running_memory_mb(), 1))
+    ])
+    lines += format_metric_family("admission_cost_calibration", "gauge", "Observed over estimated job run time", [
+        ((("kind", kind),), round(cost_calibration[kind], 3)) for kind in JOB_POOL_SIZES
+    ])
+    lines += format_metric_family("storage_bytes", "gauge", "Disk usage seen by the last janitor run", [
+        ((("kind", kind),), size) for kind, size in janitor_stats["storage_bytes"].items()
+    ])
+    lines += format_metric_family("storage_reclaimed_bytes_total", "counter", "Bytes deleted by the storage janitor", [
+        ((("kind", kind),), size) for kind, size in janitor_stats["reclaimed_bytes"].items()
+    ])
+    lines += format_metric_family("storage_deleted_files_total", "counter", "Files deleted by the storage janitor", [
+        ((("kind", kind),), count) for kind, count in janitor_stats["deleted_files"].items()
+    ])
+    return "\n".join(lines) + "\n"
+
+# Progress reporting
+#
+# Job workers push (job_id, progress) tuples onto a multiprocessing queue that
+# the API process drains into the job table; clients follow it over SSE.
+progress_queue = None
+current_job_id = None
+
+def report_progress(stage: str, percent: float, started: Optional[float] = None, eta: Optional[float] = None, **extra):
+    """Publish progress for the job running in this worker (no-op outside jobs).
+
+    Without an explicit `eta`, it is extrapolated from the time since `started`.
+    """
+    if progress_queue is None or current_job_id is None:
+        return
+    percent = max(0.0, min(100.0, percent))
+    if eta is None and started is not None and 0 < percent < 100:
+        elapsed = time.monotonic() - started
+        eta = elapsed * (100 - percent) / percent
+    progress = {"stage": stage, "percent": round(percent, 1), "eta": round(eta, 1) if eta is not None else None}
+    progress.update(extra)
+    try:
+        progress_queue.put_nowait((current_job_id, progress))
+    except Exception:
+        pass
+
+# Cancellation and time limits
+#
+# The API process marks cancelled job ids in a shared registry (see
+# get_cancel_requests); workers check it while ffmpeg or Whisper runs and end
+# the job by raising JobCancelled. External tools run in their own process
+# group, so a cancelled or timed-out ffmpeg is killed along with its children.
+cancel_manager = None
+cancel_requests = None
+
+class JobCancelled(Exception):
+    """Raised inside a job that was cancelled; the job ends as "cancelled"."""
+
+class StageTimeout(HTTPException):
+    """A stage ran past its time limit (or an external tool stopped producing output)."""
+    def __init__(self, stage: str, reason: str, stderr: str = ""):
+        self.stage = stage
+        self.reason = reason
+        self.stderr = stderr
+        super().__init__(
+            status_code=504,
+            detail={
+                "message": f"Processing timed out while {stage.replace('_', ' ')}",
+                "error": stderr,
+                "technical_details": reason,
+                "can_retry": True
+            }
+        )
+    
+    def __reduce__(self):
+        # HTTPException can't be unpickled on its own; this one crosses from the
+        # segment and chunk pools back to the job worker
+        return (StageTimeout, (self.stage, self.reason, self.stderr))
+
+def job_cancelled(job_id: Optional[str] = None) -> bool:
+    """Whether `job_id` (default: the job running in this worker) was cancelled."""
+    job_id = job_id or current_job_id
+    if cancel_requests is None or job_id is None:
+        return False
+    try:
+        return job_id in cancel_requests
+    except Exception:
+        # The registry is gone: the server is shutting down
+        return False
+
+def stage_timeout(duration: float) -> Optional[float]:
+    """Time limit for a stage processing `duration` seconds of media (None = unlimited)."""
+    if not STAGE_TIMEOUT_FACTOR or not duration:
+        return None
+    return max(STAGE_MIN_TIMEOUT, duration * STAGE_TIMEOUT_FACTOR)
+
+def kill_process_group(process: subprocess.Popen):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+@contextmanager
+def supervised_process(cmd: list, stage: str, timeout: Optional[float] = None, stall_timeout: Optional[float] = None, job_id: Optional[str] = None, text: bool = True):
+    """Start `cmd` and yield the Popen, killing it on cancellation or timeout.
+    
+    The caller reads `process.stdout` and sets `process.last_output` whenever
+    it sees output; stderr lines count as output too and the last
+    STDERR_TAIL_LINES of them are kept in `process.stderr_tail`. A watchdog
+    thread kills the process group once `job_id` (default: the current job) is
+    cancelled, `timeout` seconds have passed, or nothing was output for
+    `stall_timeout` seconds; leaving the block then raises JobCancelled or
+    StageTimeout.
+    """
+    job_id = job_id or current_job_id
+    if job_cancelled(job_id):
+        raise JobCancelled(job_id)
+    
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=True
+    )
+    if text:
+        process.stdout = io.TextIOWrapper(process.stdout, errors='replace')
+    process.stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    process.last_output = time.monotonic()
+    process.stop_reason = None
+    
+    # Drain stderr on a thread so a chatty ffmpeg can't block on a full pipe
+    def drain_stderr():
+        for line in process.stderr:
+            process.stderr_tail.append(line.decode(errors='replace'))
+            process.last_output = time.monotonic()
+    
+    finished = threading.Event()
+    deadline = time.monotonic() + timeout if timeout else None
+    
+    def watch():
+        while not finished.wait(0.25):
+            if job_cancelled(job_id):
+                process.stop_reason = "cancelled"
+            elif deadline is not None and time.monotonic() > deadline:
+                process.stop_reason = f"Exceeded the time limit of {timeout:g}s"
+            elif stall_timeout and time.monotonic() - process.last_output > stall_timeout:
+                process.stop_reason = f"No output for {stall_timeout:g}s"
+            else:
+                continue
+            logger.warning(f"Killing {cmd[0]} ({stage}): {process.stop_reason}")
+            kill_process_group(process)
+            return
+    
+    threads = [threading.Thread(target=target, daemon=True) for target in (drain_stderr, watch)]
+    for thread in threads:
+        thread.start()
+    try:
+        yield process
+        process.wait()
+    finally:
+        if process.poll() is None:
+            # The caller bailed out early
+            kill_process_group(process)
+            process.wait()
+        finished.set()
+        for thread in threads:
+            thread.join()
+        process.stdout.close()
+        process.stderr.close()
+    
+    if process.stop_reason == "cancelled":
+        raise JobCancelled(job_id)
+    if process.stop_reason is not None:
+        raise StageTimeout(stage, process.stop_reason, "".join(process.stderr_tail))
+
+def run_process(cmd: list, stage: str, timeout: Optional[float] = None, job_id: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Run `cmd` to completion under supervised_process, capturing its stdout."""
+    with supervised_process(cmd, stage, timeout, job_id=job_id, text=False) as process:
+        stdout = process.stdout.read()
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, "".join(process.stderr_tail))
+
+class WhisperProgress:
+    """Stand-in for tqdm.tqdm inside whisper.transcribe that reports decoded frames.
+    
+    Whisper calls `update` after every 30 second window, which is also where a
+    cancelled or timed-out transcription is stopped.
+    """
+    deadline = None
+    
+    def __init__(self, total=None, **kwargs):
+        self.total = total or 1
+        self.done = 0
+        self.started = time.monotonic()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        return False
+    
+    def update(self, n=1):
+        self.done += n
+        if job_cancelled():
+            raise JobCancelled(current_job_id)
+        if WhisperProgress.deadline is not None and time.monotonic() > WhisperProgress.deadline:
+            raise StageTimeout("transcribing", "Exceeded the transcription time limit")
+        report_progress("transcribing", self.done / self.total * 100, self.started)
+
+def transcribe_with_progress(model, audio, **options):
+    """Run model.transcribe, forwarding Whisper's per-window progress to the job."""
+    transcribe_module = sys.modules["whisper.transcribe"]
+    original_tqdm = transcribe_module.tqdm
+    transcribe_module.tqdm = SimpleNamespace(tqdm=WhisperProgress)
+    timeout = stage_timeout(len(audio) / WHISPER_SAMPLE_RATE)
+    WhisperProgress.deadline = time.monotonic() + timeout if timeout else None
+    try:
+        report_progress("transcribing", 0)
+        return model.transcribe(audio, verbose=False, **options)
+    finally:
+        transcribe_module.tqdm = original_tqdm
+        WhisperProgress.deadline = None
+
+def parse_progress_value(value: Optional[str]) -> Optional[float]:
+    try:
+        return float((value or "").rstrip('x'))
+    except ValueError:
+        return None
+
+def run_ffmpeg(cmd: list, duration: float = 0, stage: str = "encoding", job_id: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Run ffmpeg, reporting progress parsed from its `-progress pipe:1` output.
+    
+    The run is limited by stage_timeout(duration) and FFMPEG_STALL_TIMEOUT and
+    stops when the job is cancelled; see supervised_process.
+    """
+    cmd = cmd[:1] + ["-progress", "pipe:1", "-nostats"] + cmd[1:]
+    started = time.monotonic()
+    report_progress(stage, 0)
+    with supervised_process(cmd, stage, stage_timeout(duration), FFMPEG_STALL_TIMEOUT, job_id) as process:
+        block = {}
+        for line in process.stdout:
+            process.last_output = time.monotonic()
+            key, _, value = line.strip().partition('=')
+            block[key] = value
+            if key != "progress":
+                continue
+            # A progress block ends with "progress=continue" or "progress=end"
+            out_time_us = parse_progress_value(block.get("out_time_us"))
+            speed = parse_progress_value(block.get("speed"))
+            position = out_time_us / 1_000_000 if out_time_us else 0
+            percent = 100 if value == "end" else (position / duration * 100 if duration else 0)
+            # ffmpeg's own speed figure gives a better ETA than extrapolating elapsed time
+            eta = max(duration - position, 0) / speed if speed and duration and value != "end" else None
+            report_progress(
+                stage,
+                percent,
+                started,
+                eta,
+                fps=parse_progress_value(block.get("fps")),
+                speed=speed,
+                elapsed=round(time.monotonic() - started, 1)
+            )
+            block = {}
+    
+    record_metric("ffmpeg_seconds", time.monotonic() - started, stage=stage)
+    return subprocess.CompletedProcess(cmd, process.returncode, "", "".join(process.stderr_tail))
+
+# Parallel chunked transcription
+SILENCE_FRAME_SECONDS = 0.03
+SILENCE_SMOOTHING_SECONDS = 0.5
+SILENCE_SEARCH_SECONDS = 30
+
+chunk_pool = None
+
+def find_silence_splits(samples: np.ndarray, chunk_seconds: float) -> list:
+    """Pick split points (in samples) near every `chunk_seconds`, at the quietest moment.
+
+    Frame energies are computed in one vectorized pass, smoothed with a moving
+    average, and each split lands on the lowest-energy frame within
+    SILENCE_SEARCH_SECONDS of its nominal position, so we cut between words.
+    """
+    frame_size = int(WHISPER_SAMPLE_RATE * SILENCE_FRAME_SECONDS)
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return []
+    
+    frames = np.asarray(samples[:frame_count * frame_size]).reshape(frame_count, frame_size)
+    energy = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_size)
+    window = max(1, int(SILENCE_SMOOTHING_SECONDS / SILENCE_FRAME_SECONDS))
+    energy = np.convolve(energy, np.ones(window) / window, mode='same')
+    
+    frames_per_chunk = int(chunk_seconds / SILENCE_FRAME_SECONDS)
+    search = int(SILENCE_SEARCH_SECONDS / SILENCE_FRAME_SECONDS)
+    splits = []
+    for target in range(frames_per_chunk, frame_count - frames_per_chunk // 2, frames_per_chunk):
+        low = max(target - search, (splits[-1] // frame_size + 1) if splits else 1)
+        high = min(target + search, frame_count - 1)
+        if low >= high:
+            continue
+        quietest = low + int(np.argmin(energy[low:high]))
+        splits.append(quietest * frame_size)
+    return splits
+
+def detach_from_job():
+    """Initializer of pools nested in a job worker.
+    
+    Their processes are forked from the job worker and would otherwise report
+    progress for whichever job it was running at the time; they get the job id
+    passed explicitly where they need it.
+    """
+    global current_job_id
+    current_job_id = None
+
+def init_chunk_worker(threads: int):
+    """Chunk pool initializer: share the cores between workers instead of oversubscribing."""
+    detach_from_job()
+    import torch
+    torch.set_num_threads(threads)
+
+def shutdown_on_worker_exit(pool: ProcessPoolExecutor):
+    """Shut a pool down when the (job worker) process that owns it exits.
+
+    A job worker exits through multiprocessing, which waits for its child
+    processes without running the pool's own exit hook; without this an idle
+    nested pool would keep the worker, and so the server, from exiting. The
+    priority runs it before the finalizers of the pool's queues (priority 10).
+    """
+    multiprocessing.util.Finalize(pool, pool.shutdown, exitpriority=20)
+
+def get_chunk_pool() -> ProcessPoolExecutor:
+    global chunk_pool
+    if chunk_pool is None:
+        threads = max(1, (os.cpu_count() or 1) // TRANSCRIBE_CHUNK_WORKERS)
+        chunk_pool = ProcessPoolExecutor(
+            max_workers=TRANSCRIBE_CHUNK_WORKERS,
+            initializer=init_chunk_worker,
+            initargs=(threads,)
+        )
+        shutdown_on_worker_exit(chunk_pool)
+    return chunk_pool
+
+def transcribe_chunk(audio_path: str, start: int, end: int, language: Optional[str], model_name: str, origin: int = 0) -> dict:
+    """Transcribe samples [start, end) of an extracted audio file, on a timeline starting at sample `origin`."""
+    samples = np.memmap(audio_path, dtype=np.float32, mode='c')[start:end]
+    options = {"language": language} if language else {}
+    result = get_whisper_model(model_name).transcribe(samples, **options)
+    
+    offset = (start - origin) / WHISPER_SAMPLE_RATE
+    for segment in result["segments"]:
+        segment["start"] += offset
+        segment["end"] += offset
+        for word in segment.get("words", []):
+            word["start"] += offset
+            word["end"] += offset
+    return result
+
+def transcribe_in_chunks(input_path: str, language: Optional[str], model_name: str, first: int = 0, last: Optional[int] = None) -> dict:
+    """Split audio samples [first, last) at silences, transcribe the chunks in parallel and merge the results."""
+    audio_path = extract_audio(input_path)
+    samples = load_audio_samples(input_path)[first:last]
+    bounds = [first + split for split in [0] + find_silence_splits(samples, TRANSCRIBE_CHUNK_SECONDS) + [len(samples)]]
+    logger.info(f"Transcribing {len(bounds) - 1} chunks in parallel")
+    
+    pool = get_chunk_pool()
+    futures = [
+        pool.submit(transcribe_chunk, str(audio_path), start, end, language, model_name, first)
+        for start, end in zip(bounds, bounds[1:])
+    ]
+    started = time.monotonic()
+    timeout = stage_timeout((bounds[-1] - bounds[0]) / WHISPER_SAMPLE_RATE)
+    report_progress("transcribing", 0)
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            # Chunks already being transcribed run to completion; the rest are dropped
+            if job_cancelled():
+                raise JobCancelled(current_job_id)
+            if timeout and time.monotonic() - started > timeout:
+                raise StageTimeout("transcribing", f"Exceeded the time limit of {timeout:g}s")
+            if done:
+                report_progress("transcribing", (len(futures) - len(pending)) / len(futures) * 100, started)
+    finally:
+        for future in pending:
+            future.cancel()
+    results = [future.result() for future in futures]
+    
+    segments = []
+    for result in results:
+        for segment in result["segments"]:
+            segment["id"] = len(segments)
+            segments.append(segment)
     
+    return {
+        "text": "".join(result["text"] for result in results),
+        "segments": segments,
+        "language": results[0]["language"] if results else language
+    }
+
+def transcribe_audio(input_path: str, language: Optional[str] = None, model_name: Optional[str] = None, parallel: Optional[bool] = None, start: Optional[float] = None, end: Optional[float] = None):
+    """Transcribe audio using Whisper, reusing cached results for the same content.
+
+    With `parallel` (default: TRANSCRIBE_PARALLEL), audio longer than two chunks is
+    split at silences and transcribed across several processes. With `start`/`end`
+    only that range of the audio is transcribed, with timestamps relative to `start`.
+    """
+    model_name = model_name or WHISPER_MODEL_NAME
+    if parallel is None:
+        parallel = TRANSCRIBE_PARALLEL
+
     # Set language options
     if language == "hebrew":
         language = "he"
     elif language == "english":
         language = "en"
     
-    # Transcribe audio
-    options = {"language": language} if language else {}
-    result = model.transcribe(input_path, **options)
+    cache_path = get_transcription_cache_path(get_file_hash(input_path), language, model_name, start, end)
+    result = load_cached_json(cache_path)
+    if result is not None:
+        logger.info(f"Using cached transcription: {cache_path}")
+        record_metric("transcription_cache_requests_total", 1, result="hit")
+        return result
+    record_metric("transcription_cache_requests_total", 1, result="miss")
+    
+    # Slice the clip out of the extracted audio so Whisper only sees the requested range
+    first = int((start or 0) * WHISPER_SAMPLE_RATE)
+    last = int(end * WHISPER_SAMPLE_RATE) if end is not None else None
+    samples = load_audio_samples(input_path)[first:last]
+    chunked = parallel and len(samples) > 2 * TRANSCRIBE_CHUNK_SECONDS * WHISPER_SAMPLE_RATE
+    model = None if chunked else get_whisper_model(model_name)
+    
+    started = time.monotonic()
+    if chunked:
+        result = transcribe_in_chunks(input_path, language, model_name, first, last)
+    else:
+        # Transcribe audio
+        options = {"language": language} if language else {}
+        result = transcribe_with_progress(model, samples, **options)
+    
+    elapsed = time.monotonic() - started
+    labels = {"model": model_name, "language": language or "auto"}
+    record_metric("transcription_seconds", elapsed, **labels)
+    if len(samples):
+        record_metric("transcription_realtime_factor", elapsed / (len(samples) / WHISPER_SAMPLE_RATE), **labels)
     
+    store_cached_transcription(cache_path, result)
     return result
 
-def get_video_dimensions(file_path: str) -> tuple:
-    """Get video dimensions using ffprobe."""
-    cmd = [
-        "ffprobe",
-        "-v", "error",
-        "-select_streams", "v:0",
-        "-show_entries", "stream=width,height",
-        "-of", "csv=s=x:p=0",
-        file_path
-    ]
-    
+# Media probing
+#
+# Each file is probed once (ffprobe in JSON mode plus a keyframe listing) and the
+# result is cached on disk, keyed by path, size and modification time, so later
+# crops and renders of the same upload never spawn ffprobe again.
+media_info_cache = {}
+
+def run_ffprobe(cmd: list) -> str:
     print(f"Running ffprobe command: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = run_process(cmd, "probing", FFPROBE_TIMEOUT)
     
     if result.returncode != 0:
         print(f"ffprobe error output: {result.stderr}")
@@ -113,25 +1099,113 @@ def get_video_dimensions(file_path: str) -> tuple:
             status_code=400,
             detail=f"Could not process video file: {result.stderr}"
         )
+    return result.stdout.decode(errors='replace')
+
+def parse_frame_rate(rate: Optional[str]) -> float:
+    """Convert an ffprobe rational such as "30000/1001" to frames per second."""
+    try:
+        numerator, denominator = (rate or "0/0").split('/')
+        return int(numerator) / int(denominator) if int(denominator) else 0.0
+    except ValueError:
+        return 0.0
+
+def get_stream_rotation(stream: dict) -> int:
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            return int(side_data["rotation"]) % 360
+    return int(stream.get("tags", {}).get("rotate", 0)) % 360
+
+def probe_media(file_path: str) -> dict:
+    """Run ffprobe and collect the stream metadata the rest of the app needs."""
+    probe = json.loads(run_ffprobe([
+        "ffprobe",
+        "-v", "error",
+        "-print_format", "json",
+        "-show_format",
+        "-show_streams",
+        file_path
+    ]))
+    streams = probe.get("streams", [])
+    video = next((stream for stream in streams if stream.get("codec_type") == "video"), None)
+    audio = next((stream for stream in streams if stream.get("codec_type") == "audio"), None)
+    if video is None:
+        raise HTTPException(status_code=400, detail="File does not contain a video stream")
     
     try:
-        width, height = map(int, result.stdout.strip().split('x'))
-        print(f"Video dimensions: {width}x{height}")
-        return width, height
-    except ValueError as e:
-        print(f"Error parsing dimensions: {result.stdout}")
+        coded_width, coded_height = int(video["width"]), int(video["height"])
+    except (KeyError, ValueError):
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid video dimensions format: {result.stdout}"
+            detail=f"Invalid video dimensions: {video.get('width')}x{video.get('height')}"
         )
-
-def crop_video(input_path: str, output_path: str, target_ratio: str, position: float = 50, volume: float = 100, language: Optional[str] = None, burn_subtitles: bool = False, subtitle_styles: Optional[dict] = None):
-    """Crop video to target aspect ratio, adjust volume, and optionally burn in subtitles."""
-    width, height = get_video_dimensions(input_path)
     
-    print(f"Original dimensions: {width}x{height}")
-    print(f"Volume adjustment: {volume}%")
+    # ffmpeg auto-rotates on decode, so filters see the displayed orientation
+    rotation = get_stream_rotation(video)
+    width, height = (coded_height, coded_width) if rotation in (90, 270) else (coded_width, coded_height)
+    
+    # Keyframe timestamps, read from packet flags without decoding any frames
+    keyframes = []
+    for line in run_ffprobe([
+        "ffprobe",
+        "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        file_path
+    ]).splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    keyframes.sort()
+    
+    fmt = probe.get("format", {})
+    return {
+        "width": width,
+        "height": height,
+        "coded_width": coded_width,
+        "coded_height": coded_height,
+        "rotation": rotation,
+        "duration": float(fmt.get("duration") or video.get("duration") or 0),
+        "fps": parse_frame_rate(video.get("avg_frame_rate")) or parse_frame_rate(video.get("r_frame_rate")),
+        "video_codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "has_audio": audio is not None,
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "audio_sample_rate": int(audio.get("sample_rate", 0)) if audio else None,
+        "audio_channels": audio.get("channels") if audio else None,
+        "bit_rate": int(fmt.get("bit_rate") or 0),
+        "keyframes": keyframes
+    }
+
+def get_media_info(file_path: str) -> dict:
+    """Return probe metadata for a file, probing it only on the first call."""
+    stat = os.stat(file_path)
+    key = f"{Path(file_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+    if key in media_info_cache:
+        return media_info_cache[key]
     
+    cache_path = PROBE_CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+    info = load_cached_json(cache_path)
+    if info is None:
+        with timed("ffprobe_seconds"):
+            info = probe_media(file_path)
+        if store_cached_json(cache_path, info):
+            evict_lru_cache(PROBE_CACHE_DIR, "*.json", PROBE_CACHE_MAX_BYTES)
+    media_info_cache[key] = info
+    return info
+
+def media_summary(info: dict) -> dict:
+    """Probe metadata without the (potentially long) keyframe list, for API responses."""
+    return {key: value for key, value in info.items() if key != "keyframes"}
+
+def get_video_dimensions(file_path: str) -> tuple:
+    """Get (displayed) video dimensions from the cached probe."""
+    info = get_media_info(file_path)
+    print(f"Video dimensions: {info['width']}x{info['height']}")
+    return info["width"], info["height"]
+
+def compute_crop(width: int, height: int, target_ratio: str, position: float = 50) -> tuple:
+    """Return (width, height, x_offset, y_offset) of the crop window for a target ratio."""
     # Initialize variables
     new_width = width
     new_height = height
@@ -161,77 +1235,300 @@ def crop_video(input_path: str, output_path: str, target_ratio: str, position: f
     new_height = new_height - (new_height % 2)
     
     print(f"Final dimensions: {new_width}x{new_height}")
+    return new_width, new_height, x_offset, y_offset
+
+# Subject-tracking crop
+#
+# With auto_crop, a 9:16 window follows the subject instead of staying at one
+# position. The video is decoded once into small grayscale samples; every column
+# is scored for detail (horizontal gradients) and motion, and the scores are
+# cached per upload. A render turns them into a smoothed x-offset path per scene
+# and crops with a time-varying ffmpeg expression.
+SUBJECT_ANALYSIS_BATCH = 64
+SCENE_HISTOGRAM_BINS = 16
+# Mean absolute frame difference at which motion weighs as much as detail
+MOTION_REFERENCE = 0.01
+# Path points closer than this to the straight line between their neighbours are dropped
+CROP_PATH_TOLERANCE = 2.0
+
+def get_subject_cache_path(content_hash: str) -> Path:
+    return SUBJECT_CACHE_DIR / f"{content_hash}_{AUTO_CROP_SAMPLE_FPS:g}fps_{AUTO_CROP_ANALYSIS_WIDTH}w.npz"
+
+def luma_histograms(frames: np.ndarray) -> np.ndarray:
+    """Normalized luma histograms of a (frames, height, width) batch in [0, 1]."""
+    count, pixels = len(frames), frames[0].size
+    bins = np.minimum((frames * SCENE_HISTOGRAM_BINS).astype(np.int64), SCENE_HISTOGRAM_BINS - 1)
+    bins += (np.arange(count) * SCENE_HISTOGRAM_BINS)[:, None, None]
+    return np.bincount(bins.ravel(), minlength=count * SCENE_HISTOGRAM_BINS).reshape(count, -1) / pixels
+
+def score_columns(frames: np.ndarray, previous: Optional[np.ndarray], previous_histogram: Optional[np.ndarray]) -> tuple:
+    """Score each column of a batch of samples; returns (scores, scene cut flags).
+
+    `previous` and `previous_histogram` belong to the sample before the batch
+    (None for the first batch), so motion and cuts carry across batches.
+    """
+    detail = np.abs(np.diff(frames, axis=2)).sum(axis=1)
+    detail = np.concatenate([detail, detail[:, -1:]], axis=1)
     
-    # Calculate volume factor (1.0 = 100%)
-    volume_factor = volume / 100
+    before = np.concatenate([frames[:1] if previous is None else previous[None], frames[:-1]])
+    difference = np.abs(frames - before)
+    motion = difference.sum(axis=1)
+    
+    histograms = luma_histograms(frames)
+    histograms_before = np.concatenate([histograms[:1] if previous_histogram is None else previous_histogram[None], histograms[:-1]])
+    cuts = np.abs(histograms - histograms_before).sum(axis=1) / 2 > AUTO_CROP_SCENE_THRESHOLD
+    if previous is None:
+        cuts[0] = True
+    
+    # Both scores become distributions over the columns; motion counts for more
+    # the more there is of it, and not at all across a cut
+    amount = difference.mean(axis=(1, 2))
+    motion_weight = np.where(cuts, 0, amount / (amount + MOTION_REFERENCE))[:, None]
+    detail = detail / np.maximum(detail.sum(axis=1, keepdims=True), 1e-6)
+    motion = motion / np.maximum(motion.sum(axis=1, keepdims=True), 1e-6)
+    return (1 - motion_weight) * detail + 2 * motion_weight * motion, cuts
 
-    # Base video processing command
-    filter_complex = [f"[0:v]crop={new_width}:{new_height}:{x_offset}:{y_offset}[v];[0:a]volume={volume_factor}[a]"]
+def analyze_subjects(input_path: str) -> dict:
+    """Return the cached column scores of an upload, analyzing it on first use.
+
+    The result has `times` (seconds of each sample), `scores` (samples x
+    columns) and `scene_starts` (sample indices where a scene begins).
+    """
+    cache_path = get_subject_cache_path(get_file_hash(input_path))
+    try:
+        with np.load(cache_path) as cached:
+            analysis = {key: cached[key] for key in cached.files}
+        cache_path.touch()
+        return analysis
+    except (FileNotFoundError, ValueError, OSError):
+        pass
     
-    # If burning subtitles and language is specified
-    temp_srt_path = None
-    temp_ass_path = None
-    if burn_subtitles and language:
-        try:
-            logger.info(f"Starting subtitle burn-in process with language: {language}")
-            
-            # Create temporary SRT file
-            temp_srt_path = TRANSCRIPTS_DIR / f"temp_{uuid.uuid4()}.srt"
-            
-            # If we have existing SRT content, use it directly
-            if subtitle_styles and 'srt_content' in subtitle_styles:
-                logger.info("Using provided SRT content")
-                with open(temp_srt_path, 'w', encoding='utf-8') as f:
-                    f.write(subtitle_styles['srt_content'])
-            else:
-                # Otherwise, generate new transcription
-                logger.info("Generating new transcription")
-                print(f"Transcribing audio for subtitle burn-in...")
-                result = transcribe_audio(str(input_path), language)
-                create_srt_file(result["segments"], temp_srt_path)
-            
-            logger.info(f"Created SRT file at: {temp_srt_path}")
-            
-            # Apply subtitle styling if provided, otherwise use defaults
-            if subtitle_styles:
-                font_size = int(subtitle_styles.get('fontSize', 24))
-                font_color = subtitle_styles.get('fontColor', 'ffffff')
-                border_size = int(subtitle_styles.get('borderSize', 2))
-                border_color = subtitle_styles.get('borderColor', '000000')
-                y_position = float(subtitle_styles.get('yPosition', 90))
-                
-                # Convert RGB hex colors to ASS BBGGRR format
-                def rgb_to_ass(color):
-                    # Remove any '#' if present
-                    color = color.lstrip('#')
-                    # Ensure 6 digits
-                    if len(color) != 6:
-                        return 'FFFFFF'  # Default to white if invalid
-                    # Convert from RGB to BGR (reverse pairs of characters)
-                    return color[4:6] + color[2:4] + color[0:2]
-                
-                font_color = rgb_to_ass(font_color)
-                border_color = rgb_to_ass(border_color)
-                
-                # Scale font size based on video height for better readability
-                base_font_size = font_size
-                font_size = max(base_font_size, int(new_height * (base_font_size / 720)))  # Scale relative to 720p
-                # Scale border size proportionally
-                border_size = max(border_size, border_size * (font_size / base_font_size))
-                
-                logger.info(f"Using custom styles: size={font_size}, color={font_color}, border={border_size}")
-            else:
-                # Improved default styling
-                base_font_size = new_height // 15  # Base size relative to video height
-                font_size = max(32, min(84, base_font_size))  # Larger default font size with upper limit
-                font_color = 'FFFFFF'  # White in ASS format
-                border_size = max(3, font_size / 12)  # Proportional border size
-                border_color = '000000'  # Black in ASS format
-                y_position = 90
-                logger.info(f"Using default styles: size={font_size}, color={font_color}, border={border_size}")
-            
-            # Create ASS style header with improved text rendering
-            ass_header = f"""[Script Info]
+    media_info = get_media_info(input_path)
+    analysis_width = min(AUTO_CROP_ANALYSIS_WIDTH, media_info["width"])
+    analysis_height = max(2, round(media_info["height"] * analysis_width / media_info["width"]))
+    frame_size = analysis_width * analysis_height
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-v", "error",
+        # Frames are only analyzed at low resolution; skipping the deblocking
+        # filter speeds up decoding without changing the result noticeably
+        "-skip_loop_filter", "all",
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-vf", f"fps={AUTO_CROP_SAMPLE_FPS:g},scale={analysis_width}:{analysis_height}:flags=area,format=gray",
+        "-f", "rawvideo",
+        "pipe:1"
+    ]
+    logger.info(f"Analyzing subjects: {' '.join(cmd)}")
+    expected = max(1, media_info["duration"] * AUTO_CROP_SAMPLE_FPS)
+    scores, cuts = [], []
+    previous = previous_histogram = None
+    started = time.monotonic()
+    report_progress("analyzing", 0)
+    with timed("subject_analysis_seconds"):
+        with supervised_process(cmd, "analyzing", stage_timeout(media_info["duration"]), FFMPEG_STALL_TIMEOUT, text=False) as process:
+            while True:
+                data = process.stdout.read(frame_size * SUBJECT_ANALYSIS_BATCH)
+                process.last_output = time.monotonic()
+                count = len(data) // frame_size
+                if not count:
+                    break
+                frames = np.frombuffer(data, dtype=np.uint8, count=count * frame_size).reshape(count, analysis_height, analysis_width)
+                frames = frames.astype(np.float32) / 255
+                batch_scores, batch_cuts = score_columns(frames, previous, previous_histogram)
+                scores.append(batch_scores.astype(np.float32))
+                cuts.append(batch_cuts)
+                previous, previous_histogram = frames[-1], luma_histograms(frames[-1:])[0]
+                samples = sum(len(batch) for batch in cuts)
+                report_progress("analyzing", min(samples / expected * 100, 99), started)
+    stderr = "".join(process.stderr_tail)
+    
+    if process.returncode != 0 or not scores:
+        logger.error(f"Subject analysis failed: {stderr}")
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": "Failed to analyze video for automatic cropping",
+                "error": stderr,
+                "can_retry": True
+            }
+        )
+    
+    scores = np.concatenate(scores)
+    analysis = {
+        "times": np.arange(len(scores), dtype=np.float64) / AUTO_CROP_SAMPLE_FPS,
+        "scores": scores,
+        "scene_starts": np.flatnonzero(np.concatenate(cuts)),
+    }
+    report_progress("analyzing", 100, started)
+    logger.info(f"Analyzed {len(scores)} samples, {len(analysis['scene_starts'])} scenes in {time.monotonic() - started:.1f}s")
+    
+    temp_path = cache_path.with_suffix(f".{uuid.uuid4()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **analysis)
+        os.replace(temp_path, cache_path)
+        evict_lru_cache(SUBJECT_CACHE_DIR, "*.npz", SUBJECT_CACHE_MAX_BYTES)
+    except Exception as e:
+        logger.warning(f"Could not write cache entry {cache_path}: {e}")
+        if temp_path.exists():
+            temp_path.unlink()
+    return analysis
+
+def moving_average(values: np.ndarray, span: int) -> np.ndarray:
+    """Centered moving average along the first axis; the window shrinks at the edges."""
+    cumulative = np.concatenate([np.zeros((1, *values.shape[1:])), np.cumsum(values, axis=0)])
+    index = np.arange(len(values))
+    low = np.maximum(index - span // 2, 0)
+    high = np.minimum(index + span // 2 + 1, len(values))
+    return (cumulative[high] - cumulative[low]) / (high - low).reshape(-1, *([1] * (values.ndim - 1)))
+
+def simplify_path(times: np.ndarray, offsets: np.ndarray, tolerance: float) -> np.ndarray:
+    """Indices of the points to keep so linear interpolation stays within `tolerance` (Douglas-Peucker)."""
+    keep = np.zeros(len(times), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(times) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        line = offsets[first] + (offsets[last] - offsets[first]) * (times[first + 1:last] - times[first]) / (times[last] - times[first])
+        errors = np.abs(offsets[first + 1:last] - line)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack += [(first, split), (split, last)]
+    return np.flatnonzero(keep)
+
+def subject_crop_path(analysis: dict, width: int, crop_width: int, max_points: int = AUTO_CROP_MAX_POINTS) -> list:
+    """Turn column scores into the x offset path of a `crop_width` window.
+
+    Returns (start time, x offset, slope) pieces: each runs linearly until the
+    next one starts, and every scene starts a new piece, so cuts jump straight
+    to the new subject.
+    """
+    scores, times = analysis["scores"], analysis["times"]
+    columns = scores.shape[1]
+    window = min(max(1, round(crop_width / width * columns)), columns)
+    max_offset = width - crop_width
+    
+    # Score of every window position, with a slight preference for the center
+    # so featureless frames don't drift to the edge
+    cumulative = np.concatenate([np.zeros((len(scores), 1), dtype=np.float32), np.cumsum(scores, axis=1)], axis=1)
+    window_scores = cumulative[:, window:] - cumulative[:, :-window]
+    positions = window_scores.shape[1]
+    center_bias = 1e-3 * (1 - np.abs(np.linspace(-1, 1, positions)))
+    
+    span = max(1, round(AUTO_CROP_SMOOTHING_SECONDS * AUTO_CROP_SAMPLE_FPS))
+    bounds = [*analysis["scene_starts"].tolist(), len(scores)]
+    scenes = []
+    for first, last in zip(bounds, bounds[1:]):
+        best = np.argmax(moving_average(window_scores[first:last], span) + center_bias, axis=1)
+        offsets = moving_average(best.astype(np.float64), span) / max(positions - 1, 1) * max_offset
+        scenes.append((times[first:last], offsets))
+    
+    tolerance = CROP_PATH_TOLERANCE
+    while True:
+        pieces = []
+        for scene_times, offsets in scenes:
+            kept = simplify_path(scene_times, offsets, tolerance) if len(scene_times) > 1 else [0]
+            for current, following in zip(kept, [*kept[1:], None]):
+                slope = 0.0
+                if following is not None:
+                    slope = (offsets[following] - offsets[current]) / (scene_times[following] - scene_times[current])
+                elif current and pieces[-1][2] == 0:
+                    # The path is already flat up to the end of the scene
+                    continue
+                pieces.append((float(scene_times[current]), float(offsets[current]), float(slope)))
+        if len(pieces) <= max_points or tolerance > max_offset:
+            return pieces
+        tolerance *= 2
+
+def crop_offset_expression(pieces: list, offset: float = 0, duration: Optional[float] = None) -> str:
+    """ffmpeg expression of the path's x offset at time `t` of a clip starting `offset` seconds in.
+
+    Pieces are looked up with a balanced tree of if(lt(t,...)) comparisons, so
+    evaluation per frame stays logarithmic in the number of pieces.
+    """
+    starts = [piece[0] for piece in pieces]
+    first = max(bisect_right(starts, offset) - 1, 0)
+    last = bisect_left(starts, offset + duration) if duration is not None else len(pieces)
+    pieces = pieces[first:max(last, first + 1)]
+    
+    def piece_expression(low: int, high: int) -> str:
+        if high - low == 1:
+            start, x_offset, slope = pieces[low]
+            if abs(slope) < 1e-3:
+                return f"{x_offset:.1f}"
+            return f"{x_offset:.1f}+(t{offset - start:+.3f})*({slope:.3f})"
+        middle = (low + high) // 2
+        return f"if(lt(t,{pieces[middle][0] - offset:.3f}),{piece_expression(low, middle)},{piece_expression(middle, high)})"
+    
+    return piece_expression(0, len(pieces))
+
+def prepare_subject_analysis(input_path: str) -> dict:
+    """Job: analyze an upload for auto_crop ahead of time, e.g. for previews."""
+    analysis = analyze_subjects(input_path)
+    return {"samples": len(analysis["times"]), "scenes": len(analysis["scene_starts"])}
+
+def subject_crop_pieces(input_path: str, crop: tuple, max_points: int = AUTO_CROP_MAX_POINTS) -> Optional[list]:
+    """Crop path for a window of `crop`'s size, or None if the window cannot move sideways."""
+    width = get_media_info(input_path)["width"]
+    if crop[0] >= width:
+        return None
+    return subject_crop_path(analyze_subjects(input_path), width, crop[0], max_points)
+
+def subject_crop(crop: tuple, pieces: Optional[list], offset: float = 0, duration: Optional[float] = None) -> tuple:
+    """`crop` with its x offset following the path over the clip starting `offset` seconds in."""
+    if not pieces:
+        return crop
+    new_width, new_height, _, y_offset = crop
+    return new_width, new_height, crop_offset_expression(pieces, offset, duration), y_offset
+
+def build_ass_header(new_width: int, new_height: int, subtitle_styles: Optional[dict] = None) -> str:
+    """Build the ASS [Script Info]/[V4+ Styles] header for the cropped frame size."""
+    # Apply subtitle styling if provided, otherwise use defaults
+    if subtitle_styles:
+        font_size = int(subtitle_styles.get('fontSize', 24))
+        font_color = subtitle_styles.get('fontColor', 'ffffff')
+        border_size = int(subtitle_styles.get('borderSize', 2))
+        border_color = subtitle_styles.get('borderColor', '000000')
+        y_position = float(subtitle_styles.get('yPosition', 90))
+        
+        # Convert RGB hex colors to ASS BBGGRR format
+        def rgb_to_ass(color):
+            # Remove any '#' if present
+            color = color.lstrip('#')
+            # Ensure 6 digits
+            if len(color) != 6:
+                return 'FFFFFF'  # Default to white if invalid
+            # Convert from RGB to BGR (reverse pairs of characters)
+            return color[4:6] + color[2:4] + color[0:2]
+        
+        font_color = rgb_to_ass(font_color)
+        border_color = rgb_to_ass(border_color)
+        
+        # Scale font size based on video height for better readability
+        base_font_size = font_size
+        font_size = max(base_font_size, int(new_height * (base_font_size / 720)))  # Scale relative to 720p
+        # Scale border size proportionally
+        border_size = max(border_size, border_size * (font_size / base_font_size))
+        
+        logger.info(f"Using custom styles: size={font_size}, color={font_color}, border={border_size}")
+    else:
+        # Improved default styling
+        base_font_size = new_height // 15  # Base size relative to video height
+        font_size = max(32, min(84, base_font_size))  # Larger default font size with upper limit
+        font_color = 'FFFFFF'  # White in ASS format
+        border_size = max(3, font_size / 12)  # Proportional border size
+        border_color = '000000'  # Black in ASS format
+        y_position = 90
+        logger.info(f"Using default styles: size={font_size}, color={font_color}, border={border_size}")
+    
+    # Create ASS style header with improved text rendering
+    return f"""[Script Info]
 ScriptType: v4.00+
 PlayResX: {new_width}
 PlayResY: {new_height}
@@ -246,78 +1543,223 @@ Style: Default,Arial,{font_size},&H00{font_color},&H000000FF,&H00{border_color},
 [Events]
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
-            # Convert SRT to ASS format using FFmpeg
-            temp_ass_path = TRANSCRIPTS_DIR / f"temp_{uuid.uuid4()}.ass"
-            convert_cmd = [
-                "ffmpeg",
-                "-y",
-                "-i", str(temp_srt_path),
-                str(temp_ass_path)
-            ]
-            subprocess.run(convert_cmd, check=True, capture_output=True)
-            logger.info(f"Converted SRT to ASS format at: {temp_ass_path}")
-            
-            # Read the generated ASS file
-            with open(temp_ass_path, 'r', encoding='utf-8') as f:
-                ass_content = f.read()
-            
-            # Extract events section from the generated ASS file
-            events_section = ass_content[ass_content.find('[Events]'):]
-            
-            # Write the new ASS file with custom styles
-            with open(temp_ass_path, 'w', encoding='utf-8') as f:
-                f.write(ass_header + events_section[events_section.find('\n')+1:])
-            
-            # Create subtitle filter
-            subtitle_filter = f";[v]ass='{temp_ass_path}'[v]"
-            
-            logger.info(f"Generated subtitle filter: {subtitle_filter}")
-            filter_complex[0] += subtitle_filter
-            
-        except Exception as e:
-            print(f"Warning: Failed to burn subtitles: {str(e)}")
-            logger.error(f"Subtitle burning error: {str(e)}")
-            logger.error(f"Full error details:", exc_info=True)
-            # Continue without subtitles if there's an error
-        finally:
-            # Clean up temporary SRT file if it exists
-            if temp_srt_path and temp_srt_path.exists():
-                try:
-                    temp_srt_path.unlink()
-                except Exception as e:
-                    print(f"Warning: Could not clean up temporary SRT file: {e}")
-    
-    cmd = [
-        "ffmpeg",
-        "-y",  # Overwrite output file if it exists
-        "-i", input_path,
-        "-filter_complex", filter_complex[0],
-        "-map", "[v]",
-        "-map", "[a]",
+
+def write_ass_file(cues, new_width: int, new_height: int, subtitle_styles: Optional[dict] = None) -> Path:
+    """Write a temporary styled ASS file for the cues and return its path."""
+    ass_path = TRANSCRIPTS_DIR / f"temp_{uuid.uuid4()}.ass"
+    with timed("subtitle_ass_seconds"), open(ass_path, 'w', encoding='utf-8') as f:
+        f.write(build_ass_header(new_width, new_height, subtitle_styles) + create_ass_events(cues))
+    logger.info(f"Created ASS file at: {ass_path}")
+    return ass_path
+
+def trim_args(start: Optional[float] = None, end: Optional[float] = None) -> list:
+    """Input options that seek to `start` and stop at `end`, so only the clip is decoded."""
+    args = []
+    if start:
+        args += ["-ss", f"{start:.6f}"]
+    if end is not None:
+        args += ["-t", f"{end - (start or 0):.6f}"]
+    return args
+
+def clip_duration(media_info: dict, start: Optional[float] = None, end: Optional[float] = None) -> float:
+    clip_end = media_info["duration"] if end is None else min(end, media_info["duration"])
+    return max(clip_end - (start or 0), 0)
+
+def prepare_subtitle_cues(input_path: str, language: Optional[str], burn_subtitles: bool, subtitle_styles: Optional[dict], model_name: Optional[str], start: Optional[float] = None, end: Optional[float] = None) -> Optional[list]:
+    """Return the cues to burn in, or None when subtitles are off or unavailable.
+
+    Cue times are relative to `start`; provided SRT content is expected to be
+    on the same clip timeline (as returned by a trimmed /transcribe).
+    """
+    if not (burn_subtitles and language):
+        return None
+    try:
+        logger.info(f"Starting subtitle burn-in process with language: {language}")
+        
+        # If we have existing SRT content, use it directly
+        if subtitle_styles and 'srt_content' in subtitle_styles:
+            logger.info("Using provided SRT content")
+            cues = parse_srt(subtitle_styles['srt_content'])
+        else:
+            # Otherwise, generate new transcription
+            logger.info("Generating new transcription")
+            print(f"Transcribing audio for subtitle burn-in...")
+            result = transcribe_audio(str(input_path), language, model_name, start=start, end=end)
+            cues = segments_to_cues(result["segments"])
+        
+        logger.info(f"Prepared {len(cues)} subtitle cues")
+        return cues
+    except Exception as e:
+        print(f"Warning: Failed to burn subtitles: {str(e)}")
+        logger.error(f"Subtitle burning error: {str(e)}")
+        logger.error(f"Full error details:", exc_info=True)
+        # Continue without subtitles if there's an error
+        return None
+
+def build_video_filter(crop: tuple, ass_path: Optional[Path], encoding: dict) -> str:
+    """Filter chain for one output: crop, optional subtitle burn-in, profile downscale.
+
+    The x offset may be an ffmpeg expression of `t` (see subject_crop).
+    """
+    new_width, new_height, x_offset, y_offset = crop
+    if isinstance(x_offset, str):
+        x_offset = f"'{x_offset}'"
+    video_filter = f"crop={new_width}:{new_height}:{x_offset}:{y_offset}"
+    if ass_path:
+        video_filter += f",ass='{ass_path}'"
+    # Downscale after burn-in so subtitles keep their layout
+    if encoding["max_height"] and new_height > encoding["max_height"]:
+        video_filter += f",scale=-2:{encoding['max_height']}"
+    return video_filter
+
+def video_encoder_args(encoding: dict) -> list:
+    return [
         "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
+        "-preset", encoding["preset"],
+        "-crf", str(encoding["crf"]),
         "-profile:v", "main",
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-c:a", "aac",
-        "-b:a", "192k",
-        output_path
+        "-pix_fmt", "yuv420p"
     ]
+
+def crop_video(input_path: str, output_path: str, target_ratio: str, position: float = 50, volume: float = 100, language: Optional[str] = None, burn_subtitles: bool = False, subtitle_styles: Optional[dict] = None, model_name: Optional[str] = None, profile: Optional[str] = None, parallel: Optional[bool] = None, start: Optional[float] = None, end: Optional[float] = None, fragmented: bool = False, auto_crop: bool = False, segment_store: Optional[Path] = None):
+    """Crop video to target aspect ratio, adjust volume, and optionally burn in subtitles.
+
+    With `parallel` (default: RENDER_PARALLEL), sources long enough to split into
+    several keyframe-aligned segments are encoded segment by segment in parallel.
+    With `start`/`end` only that time range of the source is decoded and rendered.
+    A `fragmented` MP4 can be played while it is still being written; it is
+    always encoded in one pass. With `auto_crop` a vertical crop follows the
+    subject instead of staying at `position`. With a `segment_store` directory
+    the render is always segmented and segments kept from an earlier render
+    with the same subtitles are reused (see crop_video_segmented).
+    """
+    if parallel is None:
+        parallel = RENDER_PARALLEL
+    if (parallel or segment_store) and not fragmented:
+        media_info = get_media_info(input_path)
+        clip_start = start or 0
+        clip_end = clip_start + clip_duration(media_info, start, end)
+        keyframes = [keyframe - clip_start for keyframe in media_info["keyframes"] if clip_start < keyframe < clip_end]
+        segment_seconds = RENDER_INCREMENTAL_SEGMENT_SECONDS if segment_store else RENDER_SEGMENT_SECONDS
+        segments = plan_segments(keyframes, clip_end - clip_start, segment_seconds)
+        if len(segments) > 1:
+            cues = prepare_subtitle_cues(input_path, language, burn_subtitles, subtitle_styles, model_name, start, end)
+            started = time.monotonic()
+            crop_video_segmented(input_path, output_path, segments, target_ratio, position, volume, cues, subtitle_styles, profile, clip_start, auto_crop, segment_store)
+            record_render_metrics(
+                [{"target_ratio": target_ratio, "profile": profile}], language, media_info,
+                clip_end - clip_start, time.monotonic() - started
+            )
+            return
+    crop_video_batch(
+        input_path,
+        [{"output_path": output_path, "target_ratio": target_ratio, "position": position, "profile": profile, "fragmented": fragmented, "auto_crop": auto_crop}],
+        volume=volume,
+        language=language,
+        burn_subtitles=burn_subtitles,
+        subtitle_styles=subtitle_styles,
+        model_name=model_name,
+        start=start,
+        end=end
+    )
+
+def crop_video_batch(input_path: str, outputs: list, volume: float = 100, language: Optional[str] = None, burn_subtitles: bool = False, subtitle_styles: Optional[dict] = None, model_name: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None):
+    """Crop one source into several outputs with a single ffmpeg run.
+
+    Each entry of `outputs` has an output_path, target_ratio, position,
+    profile and optionally `fragmented` and `auto_crop`. The source is decoded once (only the `start`/`end` range, if
+    given) and `split` into one crop/encode branch per output.
+    """
+    media_info = get_media_info(input_path)
+    width, height = media_info["width"], media_info["height"]
+    count = len(outputs)
     
-    print(f"Running FFmpeg command: {' '.join(cmd)}")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    logger.debug(f"Original dimensions: {width}x{height}")
+    logger.debug(f"Volume adjustment: {volume}%")
     
-    # Clean up temporary ASS file if it was created
-    if temp_ass_path and temp_ass_path.exists():
-        try:
-            temp_ass_path.unlink()
-            print(f"Cleaned up temporary ASS file: {temp_ass_path}")
-        except Exception as e:
-            print(f"Warning: Could not clean up temporary ASS file: {e}")
+    # Calculate volume factor (1.0 = 100%)
+    volume_factor = volume / 100
+    
+    # Untouched AAC audio is copied as-is instead of being decoded and re-encoded
+    copy_audio = media_info["has_audio"] and volume == 100 and media_info["audio_codec"] == "aac"
+    
+    # Subtitle cues are prepared once and laid out per output frame size
+    cues = prepare_subtitle_cues(input_path, language, burn_subtitles, subtitle_styles, model_name, start, end)
+    
+    # Decode once and fan the frames (and filtered audio) out to every branch
+    if count > 1:
+        filters = ["[0:v]split=" + str(count) + "".join(f"[s{i}]" for i in range(count))]
+        sources = [f"[s{i}]" for i in range(count)]
+    else:
+        filters = []
+        sources = ["[0:v]"]
+    if media_info["has_audio"] and not copy_audio:
+        audio_split = f",asplit={count}" if count > 1 else ""
+        filters.append(f"[0:a]volume={volume_factor}{audio_split}" + "".join(f"[a{i}]" for i in range(count)))
+    
+    # Crop paths of all outputs share one command line
+    auto_crop_outputs = sum(1 for output in outputs if output.get("auto_crop"))
+    max_points = AUTO_CROP_MAX_POINTS // max(auto_crop_outputs, 1)
+    
+    temp_ass_paths = []
+    output_args = []
+    try:
+        for i, (output, source) in enumerate(zip(outputs, sources)):
+            profile = output.get("profile") or DEFAULT_ENCODING_PROFILE
+            encoding = ENCODING_PROFILES[profile]
+            crop = compute_crop(width, height, output["target_ratio"], float(output.get("position", 50)))
+            if output.get("auto_crop"):
+                crop = subject_crop(
+                    crop, subject_crop_pieces(input_path, crop, max_points), start or 0, clip_duration(media_info, start, end)
+                )
+            new_width, new_height, x_offset, y_offset = crop
+            
+            temp_ass_path = None
+            if cues is not None:
+                # Write the ASS file with custom styles for this frame size
+                temp_ass_path = write_ass_file(cues, new_width, new_height, subtitle_styles)
+                temp_ass_paths.append(temp_ass_path)
+            branch = build_video_filter((new_width, new_height, x_offset, y_offset), temp_ass_path, encoding)
+            filters.append(f"{source}{branch}[v{i}]")
+            
+            # Fragmented MP4 puts the header first and flushes a fragment per keyframe,
+            # so the file is playable while it grows; otherwise index it for fast start
+            movflags = "+frag_keyframe+empty_moov+default_base_moof" if output.get("fragmented") else "+faststart"
+            output_args += ["-map", f"[v{i}]", *video_encoder_args(encoding), "-movflags", movflags]
+            if ENCODER_THREADS:
+                output_args += ["-threads", str(ENCODER_THREADS)]
+            if copy_audio:
+                output_args += ["-map", "0:a:0", "-c:a", "copy"]
+            elif media_info["has_audio"]:
+                output_args += ["-map", f"[a{i}]", "-c:a", "aac", "-b:a", encoding["audio_bitrate"]]
+            output_args.append(str(output["output_path"]))
+            
+            logger.info(f"Output {i}: {output['target_ratio']} at {'auto' if output.get('auto_crop') else output.get('position', 50)}%, encoding profile: {profile}")
+        
+        cmd = [
+            "ffmpeg",
+            "-y",  # Overwrite output files if they exist
+            *trim_args(start, end),
+            "-i", input_path,
+            "-filter_complex", ";".join(filters),
+            *output_args
+        ]
+        
+        logger.debug(f"Copy audio: {copy_audio}")
+        logger.debug(f"Running FFmpeg command: {' '.join(cmd)}")
+        started = time.monotonic()
+        result = run_ffmpeg(cmd, clip_duration(media_info, start, end))
+    finally:
+        # Clean up temporary ASS files
+        for temp_ass_path in temp_ass_paths:
+            try:
+                temp_ass_path.unlink()
+                logger.debug(f"Cleaned up temporary ASS file: {temp_ass_path}")
+            except Exception as e:
+                logger.warning(f"Could not clean up temporary ASS file: {e}")
     
     if result.returncode != 0:
-        print(f"FFmpeg error output: {result.stderr}")
+        logger.error(f"FFmpeg error output: {result.stderr}")
         raise HTTPException(
             status_code=500,
             detail={
@@ -328,71 +1770,1342 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             }
         )
     else:
-        print("FFmpeg processing completed successfully")
+        logger.info("FFmpeg processing completed successfully")
+        record_render_metrics(outputs, language, media_info, clip_duration(media_info, start, end), time.monotonic() - started)
+
+def record_render_metrics(outputs: list, language: Optional[str], media_info: dict, duration: float, elapsed: float):
+    """Observe encode time, fps and speed per output, labeled by ratio, language and profile."""
+    for output in outputs:
+        labels = {
+            "target_ratio": output["target_ratio"],
+            "language": language or "none",
+            "profile": output.get("profile") or DEFAULT_ENCODING_PROFILE,
+        }
+        record_metric("render_encode_seconds", elapsed, **labels)
+        if elapsed > 0:
+            record_metric("render_encode_speed", duration / elapsed, **labels)
+            if media_info.get("fps"):
+                record_metric("render_encode_fps", duration * media_info["fps"] / elapsed, **labels)
+
+# Segment-parallel rendering
+segment_pool = None
+
+def get_segment_pool() -> ProcessPoolExecutor:
+    global segment_pool
+    if segment_pool is None:
+        segment_pool = ProcessPoolExecutor(max_workers=RENDER_SEGMENT_WORKERS, initializer=detach_from_job)
+        shutdown_on_worker_exit(segment_pool)
+    return segment_pool
+
+def plan_segments(keyframes: list, duration: float, segment_seconds: float) -> list:
+    """Split [0, duration) into (start, end) ranges of about `segment_seconds` that start on keyframes."""
+    bounds = [0.0]
+    for keyframe in keyframes:
+        # Leave the tail at least half a segment long rather than a sliver
+        if keyframe - bounds[-1] >= segment_seconds and duration - keyframe >= segment_seconds / 2:
+            bounds.append(keyframe)
+    bounds.append(duration)
+    return list(zip(bounds, bounds[1:]))
+
+def encode_segment(input_path: str, output_path: str, start: float, end: float, video_filter: str, encoding: dict, threads: int, job_id: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Encode the video of [start, end) through the filter chain, without audio."""
+    cmd = [
+        "ffmpeg",
+        "-y",
+        # Input-side seek to a keyframe: only this segment is decoded
+        *trim_args(start, end),
+        "-i", input_path,
+        "-map", "0:v:0",
+        "-vf", video_filter,
+        *video_encoder_args(encoding),
+        "-threads", str(threads),
+        "-an",
+        # Explicit, since stored segments are written under a .tmp name first
+        "-f", "mp4",
+        output_path
+    ]
+    return run_ffmpeg(cmd, end - start, "encoding_segment", job_id)
+
+def encode_audio_track(input_path: str, output_path: str, volume_factor: float, bitrate: str, start: Optional[float] = None, end: Optional[float] = None, job_id: Optional[str] = None) -> subprocess.CompletedProcess:
+    """Encode the whole audio track in one pass, so chunk boundaries leave no AAC priming gaps."""
+    cmd = [
+        "ffmpeg",
+        "-y",
+        *trim_args(start, end),
+        "-i", input_path,
+        "-map", "0:a:0",
+        "-af", f"volume={volume_factor}",
+        "-c:a", "aac",
+        "-b:a", bitrate,
+        "-f", "mp4",
+        output_path
+    ]
+    duration = end - (start or 0) if end is not None else 0
+    return run_ffmpeg(cmd, duration, "encoding_audio", job_id)
+
+def segment_failure(result: subprocess.CompletedProcess) -> HTTPException:
+    logger.error(f"FFmpeg error output: {result.stderr}")
+    return HTTPException(
+        status_code=500,
+        detail={
+            "message": "Failed to process video",
+            "error": result.stderr,
+            "technical_details": "FFmpeg command failed",
+            "can_retry": True
+        }
+    )
+
+def segment_cues(cues: list, segment_start: float, segment_end: float) -> list:
+    """Cues shown during [segment_start, segment_end), timed relative to the segment start."""
+    start_ms = round(segment_start * 1000)
+    length_ms = round(segment_end * 1000) - start_ms
+    return [cue for cue in shift_cues(cues, start_ms) if cue[0] < length_ms]
+
+def segment_signature(segment_start: float, segment_end: float, cues: Optional[list]) -> str:
+    """Identify a segment of a stored render by its bounds and the cues burned into it."""
+    data = json.dumps([round(segment_start, 3), round(segment_end, 3), cues or []])
+    return hashlib.sha256(data.encode()).hexdigest()[:16]
+
+def touch_if_exists(path: Path) -> bool:
+    """Mark a stored file as just used, so eviction spares it; False if it is gone."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+def load_segment_manifest(store: Path) -> dict:
+    """Read a segment store's manifest, dropping entries whose files were evicted."""
+    manifest = load_cached_json(store / "manifest.json") or {"segments": {}, "audio": {}}
+    manifest["segments"] = {
+        signature: entry for signature, entry in manifest["segments"].items()
+        if (store / entry["file"]).exists()
+    }
+    return manifest
+
+def update_segment_manifest(store: Path, entries: dict):
+    """Add `entries` to a store's manifest.
+    
+    Renders of the same store run in different worker processes, so the
+    manifest is re-read and merged under a lock instead of overwritten.
+    """
+    with open(store / "manifest.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            manifest = load_segment_manifest(store)
+            manifest["segments"].update(entries)
+            store_cached_json(store / "manifest.json", manifest)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def crop_video_segmented(input_path: str, output_path: str, segments: list, target_ratio: str, position: float = 50, volume: float = 100, cues: Optional[list] = None, subtitle_styles: Optional[dict] = None, profile: Optional[str] = None, start: float = 0, auto_crop: bool = False, store: Optional[Path] = None):
+    """Encode keyframe-aligned segments in parallel and concatenate them without re-encoding.
+
+    `segments` are (start, end) ranges relative to the clip starting at `start`.
+    Each segment gets its own ASS file with the cues it shows, rebased to the
+    segment start. Audio is encoded (or copied) as one continuous track and
+    muxed in when the segments are joined.
+
+    With a `store` directory, segments and the encoded audio are kept there and
+    listed in its manifest.json by segment_signature, so a later render with
+    edited subtitles only re-encodes the segments whose cues changed.
+    """
+    encoding = ENCODING_PROFILES[profile or DEFAULT_ENCODING_PROFILE]
+    media_info = get_media_info(input_path)
+    crop = compute_crop(media_info["width"], media_info["height"], target_ratio, position)
+    pieces = subject_crop_pieces(input_path, crop) if auto_crop else None
+    copy_audio = media_info["has_audio"] and volume == 100 and media_info["audio_codec"] == "aac"
+    threads = max(1, (os.cpu_count() or 1) // RENDER_SEGMENT_WORKERS)
+    duration = segments[-1][1]
+    # Stop each segment half a frame before the next keyframe, so rounding in the
+    # seek arithmetic never encodes the boundary frame twice
+    margin = 0.5 / media_info["fps"] if media_info.get("fps") else 0
+    
+    manifest = None
+    if store is not None:
+        store.mkdir(parents=True, exist_ok=True)
+        segment_dir = store
+        manifest = load_segment_manifest(store)
+    else:
+        segment_dir = OUTPUT_DIR / f"segments_{uuid.uuid4()}"
+        segment_dir.mkdir()
+    segment_paths = []
+    # Manifest entries of the segments this render encodes
+    new_entries = {}
+    # Stored files are encoded under a temporary name and only renamed once the
+    # whole render succeeded, so the store never holds a partial segment
+    pending_paths = []
+    temp_ass_paths = []
+    try:
+        pool = get_segment_pool()
+        futures = []
+        for index, (segment_start, segment_end) in enumerate(segments):
+            burned = segment_cues(cues, segment_start, segment_end) if cues is not None else None
+            if manifest is not None:
+                signature = segment_signature(segment_start, segment_end, burned)
+                segment_path = segment_dir / f"segment_{index:04d}_{signature}.mp4"
+                segment_paths.append(segment_path)
+                # Touched right away, so a concurrent eviction keeps what we reuse
+                if signature in manifest["segments"] and touch_if_exists(segment_path):
+                    continue
+                new_entries[signature] = {
+                    "index": index, "start": segment_start, "end": segment_end,
+                    "file": segment_path.name, "cues": burned or []
+                }
+                # .tmp names are not matched by the eviction glob
+                target_path = segment_path.with_suffix(f".{uuid.uuid4()}.tmp")
+                pending_paths.append((target_path, segment_path))
+            else:
+                segment_path = target_path = segment_dir / f"segment_{index:04d}.mp4"
+                segment_paths.append(segment_path)
+            
+            ass_path = None
+            if burned is not None:
+                ass_path = write_ass_file(burned, crop[0], crop[1], subtitle_styles)
+                temp_ass_paths.append(ass_path)
+            futures.append(pool.submit(
+                encode_segment, input_path, str(target_path),
+                start + segment_start, start + segment_end - (margin if index < len(segments) - 1 else 0),
+                build_video_filter(subject_crop(crop, pieces, start + segment_start, segment_end - segment_start), ass_path, encoding), encoding, threads,
+                current_job_id
+            ))
+        
+        audio_future = None
+        audio_path = None
+        if media_info["has_audio"] and not copy_audio:
+            audio_path = segment_dir / (f"audio_{volume:g}_{encoding['audio_bitrate']}.m4a" if manifest is not None else "audio.m4a")
+            if manifest is None or not touch_if_exists(audio_path):
+                target_path = audio_path.with_suffix(f".{uuid.uuid4()}.tmp") if manifest is not None else audio_path
+                if manifest is not None:
+                    pending_paths.append((target_path, audio_path))
+                audio_future = pool.submit(
+                    encode_audio_track, input_path, str(target_path), volume / 100, encoding["audio_bitrate"],
+                    start, start + duration, current_job_id
+                )
+        
+        logger.info(f"Encoding {len(futures)} of {len(segments)} segments on {RENDER_SEGMENT_WORKERS} workers, copy audio: {copy_audio}")
+        if manifest is not None:
+            record_metric("render_segments_total", len(futures), result="encoded")
+            record_metric("render_segments_total", len(segments) - len(futures), result="reused")
+        started = time.monotonic()
+        report_progress("encoding", 0)
+        try:
+            for completed, _ in enumerate(as_completed(futures), 1):
+                report_progress("encoding", completed / len(futures) * 100, started, segments=len(futures))
+            for future in [*futures, audio_future]:
+                if future is not None and future.result().returncode != 0:
+                    raise segment_failure(future.result())
+        except BaseException:
+            # Segments that haven't started yet are dropped; running ones stop on
+            # their own when the job was cancelled
+            for future in [*futures, audio_future]:
+                if future is not None:
+                    future.cancel()
+            raise
+        for target_path, final_path in pending_paths:
+            os.replace(target_path, final_path)
+        pending_paths = []
+        
+        concat_list = segment_dir / f"segments_{uuid.uuid4()}.txt"
+        concat_list.write_text("".join(f"file '{segment_path.resolve()}'\n" for segment_path in segment_paths))
+        cmd = ["ffmpeg", "-y", "-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if audio_path is not None:
+            cmd += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+        elif copy_audio:
+            cmd += [*trim_args(start, start + duration), "-i", input_path, "-map", "0:v", "-map", "1:a:0"]
+        cmd += ["-c", "copy", "-movflags", "+faststart", output_path]
+        
+        logger.debug(f"Running FFmpeg command: {' '.join(cmd)}")
+        try:
+            result = run_ffmpeg(cmd, duration, "concatenating")
+        finally:
+            concat_list.unlink()
+        if result.returncode != 0:
+            raise segment_failure(result)
+        logger.info("FFmpeg processing completed successfully")
+        
+        if manifest is not None:
+            update_segment_manifest(store, new_entries)
+            evict_lru_cache(SEGMENT_CACHE_DIR, "*/*.mp4", SEGMENT_CACHE_MAX_BYTES, "*/*.m4a")
+    finally:
+        if manifest is None:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+        for target_path, _ in pending_paths:
+            if target_path.exists():
+                target_path.unlink()
+        for temp_ass_path in temp_ass_paths:
+            try:
+                temp_ass_path.unlink()
+            except Exception as e:
+                logger.warning(f"Could not clean up temporary ASS file: {e}")
+
+# Background jobs
+#
+# Crops and renders are submitted as jobs and executed in process pools so a
+# long ffmpeg or Whisper run never blocks the event loop. The job table lives in
+# the API process; the pools only ever see plain, picklable arguments.
+jobs = {}
+job_pools = {}
+job_tasks = set()
+# dedupe key -> id of the queued or running job producing that result
+inflight_jobs = {}
+# job id -> number of open event and output streams following the job, and
+# when a client last followed it (for cancel_on_disconnect)
+job_watchers = {}
+job_last_seen = {}
+
+FINISHED_JOB_STATUSES = ("done", "failed", "cancelled")
+
+JOB_POOL_SIZES = {
+    "render": RENDER_WORKERS,
+    "transcribe": TRANSCRIBE_WORKERS,
+}
+
+def validate_encoding_profile(profile: Optional[str]):
+    if profile and profile not in ENCODING_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Profile must be one of: {', '.join(ENCODING_PROFILES)}"
+        )
+
+def validate_model_name(model_name: Optional[str]):
+    if model_name and model_name not in WHISPER_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Model must be one of: {', '.join(WHISPER_MODELS)}"
+        )
+
+def validate_crop_options(data: dict, suffix: str = "") -> dict:
+    """Check target_ratio, position and volume of a JSON body like /crop does.
+    
+    Returns the three values with defaults filled in and numbers as floats.
+    """
+    target_ratio = data.get('target_ratio', '9:16')
+    if target_ratio not in ["9:16", "16:9"]:
+        raise HTTPException(status_code=400, detail=f"Invalid aspect ratio{suffix}")
+    options = {"target_ratio": target_ratio}
+    for name, default, limit in (('position', 50, 100), ('volume', 100, 300)):
+        try:
+            value = float(data.get(name, default))
+        except (TypeError, ValueError):
+            value = None
+        if value is None or not 0 <= value <= limit:
+            raise HTTPException(status_code=400, detail=f"{name.capitalize()} must be between 0 and {limit}{suffix}")
+        options[name] = value
+    return options
+
+def parse_time_range(data: dict) -> tuple:
+    """Return the (start, end) seconds of a request body, None where unset."""
+    times = []
+    for name in ('start', 'end'):
+        value = data.get(name)
+        if value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = None
+            if value is None or not math.isfinite(value):
+                raise HTTPException(status_code=400, detail=f"{name.capitalize()} must be a number of seconds")
+        times.append(value)
+    return tuple(times)
+
+def validate_time_range(start: Optional[float], end: Optional[float], duration: float):
+    if start is None and end is None:
+        return
+    if (start or 0) < 0 or (start or 0) >= duration or (end is not None and end <= (start or 0)):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Time range must satisfy 0 <= start < end and start < duration ({duration:.3f}s)"
+        )
+
+def consume_progress(queue):
+    """Copy progress reports from the workers into the job table (runs on a thread)."""
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        if item[0] == "metric":
+            # A metric observation forwarded by a job worker
+            _, name, value, labels = item
+            record_metric(name, value, **dict(labels))
+            continue
+        job_id, progress = item
+        job = jobs.get(job_id)
+        if job is not None and job["status"] == "running":
+            job["progress"] = progress
+
+def get_worker_context():
+    """Return the multiprocessing context the job pools start their workers with."""
+    context = multiprocessing.get_context(WORKER_START_METHOD)
+    if WORKER_START_METHOD == "forkserver":
+        context.set_forkserver_preload(["worker"])
+    return context
+
+def get_progress_queue():
+    global progress_queue
+    if progress_queue is None:
+        progress_queue = get_worker_context().Queue()
+        threading.Thread(target=consume_progress, args=(progress_queue,), daemon=True).start()
+    return progress_queue
+
+def get_cancel_requests():
+    """Return the registry of cancelled job ids shared with the workers.
+    
+    It is a dict served by a multiprocessing manager process, started with the
+    first job pool so the workers inherit it.
+    """
+    global cancel_manager, cancel_requests
+    if cancel_requests is None:
+        cancel_manager = multiprocessing.managers.SyncManager()
+        # Ctrl+C reaches the whole process group; let the server shut it down instead
+        cancel_manager.start(signal.signal, (signal.SIGINT, signal.SIG_IGN))
+        cancel_requests = cancel_manager.dict()
+    return cancel_requests
+
+def init_job_worker(queue, cancelled):
+    """Job pool initializer: connect progress reporting, metrics and cancellation, and preload models."""
+    global progress_queue, forward_metrics, cancel_requests
+    progress_queue = queue
+    forward_metrics = True
+    cancel_requests = cancelled
+    preload_whisper_models()
+
+def get_job_pool(kind: str) -> ProcessPoolExecutor:
+    """Return the process pool for a job kind, creating it on first use."""
+    if kind not in job_pools:
+        job_pools[kind] = ProcessPoolExecutor(
+            max_workers=JOB_POOL_SIZES[kind],
+            mp_context=get_worker_context(),
+            initializer=init_job_worker,
+            initargs=(get_progress_queue(), get_cancel_requests())
+        )
+        logger.info(f"Started {kind} pool with {JOB_POOL_SIZES[kind]} workers")
+    return job_pools[kind]
+
+def job_error_detail(error) -> dict:
+    """Normalize an error into the detail format the frontend expects."""
+    if isinstance(error, dict):
+        return error
+    return {"message": str(error), "can_retry": True}
+
+def run_job_task(job_id: Optional[str], func, *args, **kwargs):
+    """Run a job function inside a worker process and capture its outcome.
+
+    Exceptions are converted into plain dicts here because HTTPException does
+    not survive the trip back across the process boundary; `status_code` keeps
+    the HTTP status a synchronous request should answer with.
+    """
+    global current_job_id
+    current_job_id = job_id
+    try:
+        return {"status": "done", "result": func(*args, **kwargs)}
+    except JobCancelled:
+        logger.info(f"Job {job_id} cancelled")
+        return {"status": "cancelled", "error": job_error_detail("Processing was cancelled"), "status_code": 409}
+    except HTTPException as e:
+        return {"status": "failed", "error": job_error_detail(e.detail), "status_code": e.status_code}
+    except Exception as e:
+        logger.error(f"Job failed: {str(e)}", exc_info=True)
+        return {"status": "failed", "error": job_error_detail(str(e)), "status_code": 500}
+    finally:
+        current_job_id = None
+
+def discard_job_pool(kind: str, pool: ProcessPoolExecutor):
+    """Forget a broken pool so the next get_job_pool starts a fresh one."""
+    if job_pools.get(kind) is pool:
+        del job_pools[kind]
+        logger.warning(f"The {kind} pool broke (a worker died), it will be restarted")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_in_pool(kind: str, func, *args):
+    """Run a function in the worker pool for `kind` without blocking the loop.
+    
+    A worker that dies (e.g. OOM-killed) breaks its whole pool; the pool is
+    then discarded and BrokenProcessPool raised for the work that was in it.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_job_pool(kind)
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        discard_job_pool(kind, pool)
+        raise
+
+async def run_admitted(task: dict, func, *args) -> dict:
+    """Run `func` in the pool of `task["kind"]` once the scheduler gives it a worker slot."""
+    if not await acquire_job_slot(task):
+        return {"status": "cancelled", "error": job_error_detail("Processing was cancelled"), "status_code": 409}
+    started = time.monotonic()
+    try:
+        outcome = await run_in_pool(task["kind"], run_job_task, task["job_id"], func, *args)
+    except BrokenProcessPool as e:
+        logger.error(f"{func.__name__} crashed: {str(e)}")
+        outcome = {"status": "failed", "error": job_error_detail(str(e)), "status_code": 500}
+    finally:
+        release_job_slot(task)
+    if outcome["status"] == "done":
+        calibrate_cost(task["job_id"], time.monotonic() - started)
+    return outcome
+
+async def run_until_disconnected(request: Request, kind: str, cost: tuple, func, *args, file_id: Optional[str] = None) -> dict:
+    """Run `func` in the `kind` pool for a request, cancelling it if the client disconnects.
+    
+    The request is admitted and scheduled like a job of `kind` costing `cost`
+    on upload `file_id` (see admit_job). Returns the outcome dict of run_job_task.
+    """
+    reservation = admit_job(kind, client_id(request), cost, file_id)
+    task_id = f"request-{uuid.uuid4()}"
+    admitted_jobs[task_id] = reservation
+    # Stands in for a job record while the request waits for and holds a slot
+    pending = {"job_id": task_id, "kind": kind, "status": "queued"}
+    task = asyncio.ensure_future(run_admitted(pending, func, *args))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=JOB_EVENT_INTERVAL)
+            if not task.done() and await request.is_disconnected():
+                logger.info(f"Client disconnected, cancelling {func.__name__}")
+                pending["status"] = "cancelled"
+                get_cancel_requests()[task_id] = True
+                dispatch_jobs()
+                break
+        return await task
+    finally:
+        admitted_jobs.pop(task_id, None)
+        if cancel_requests is not None:
+            cancel_requests.pop(task_id, None)
+
+def prune_finished_jobs():
+    """Forget the oldest finished jobs once more than MAX_FINISHED_JOBS are kept."""
+    finished = [job for job in jobs.values() if job["status"] in FINISHED_JOB_STATUSES]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda job: job["finished_at"])
+    for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        jobs.pop(job["job_id"], None)
+        job_last_seen.pop(job["job_id"], None)
+
+async def execute_job(job_id: str, func, *args, dedupe_key: Optional[str] = None):
+    job = jobs[job_id]
+    queued_at = time.monotonic()
+    try:
+        if not await acquire_job_slot(job):
+            # Cancelled while it was queued
+            return
+        try:
+            job["status"] = "running"
+            job["started_at"] = datetime.datetime.now().isoformat()
+            started = time.monotonic()
+            record_metric("job_wait_seconds", started - queued_at, kind=job["kind"])
+            logger.info(f"Job {job_id} ({job['kind']}) started")
+            try:
+                outcome = await run_in_pool(job["kind"], run_job_task, job_id, func, *args)
+            except Exception as e:
+                # The pool itself failed (e.g. a worker was killed)
+                logger.error(f"Job {job_id} crashed: {str(e)}")
+                outcome = {"status": "failed", "error": job_error_detail(str(e))}
+        finally:
+            release_job_slot(job)
+        # Job clients read the error from the job record, not an HTTP status
+        outcome.pop("status_code", None)
+        job.update(outcome)
+        if cancel_requests is not None:
+            cancel_requests.pop(job_id, None)
+        record_metric("job_duration_seconds", time.monotonic() - started, kind=job["kind"], status=job["status"])
+        if job["status"] == "done":
+            job["progress"] = {"stage": "done", "percent": 100, "eta": 0}
+            calibrate_cost(job_id, time.monotonic() - started)
+        job["finished_at"] = datetime.datetime.now().isoformat()
+        logger.info(f"Job {job_id} finished with status: {job['status']}")
+        prune_finished_jobs()
+    finally:
+        admitted_jobs.pop(job_id, None)
+        # A job cancelled while queued has already given up its key
+        if dedupe_key and inflight_jobs.get(dedupe_key) == job_id:
+            del inflight_jobs[dedupe_key]
+
+def create_job_record(kind: str, file_id: Optional[str] = None, cancel_on_disconnect: bool = False) -> dict:
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = {
+        "job_id": job_id,
+        "kind": kind,
+        "file_id": file_id,
+        "status": "queued",
+        "created_at": datetime.datetime.now().isoformat(),
+        "started_at": None,
+        "finished_at": None,
+        "progress": None,
+        "result": None,
+        "error": None,
+        "cancel_on_disconnect": cancel_on_disconnect,
+    }
+    return jobs[job_id]
+
+def submit_job(kind: str, func, *args, file_id: Optional[str] = None, dedupe_key: Optional[str] = None, cancel_on_disconnect: bool = False, client: Optional[str] = None, cost: tuple = (0, 0)) -> dict:
+    """Queue `func(*args)` on the `kind` pool and return the job record.
+
+    Jobs submitted with the same `dedupe_key` while one is still queued or
+    running share that job instead of doing the work twice. With
+    `cancel_on_disconnect`, the job is cancelled once its clients go away
+    (see watch_job). A new job must first be admitted for `client` at its
+    estimated `cost`, (worker seconds, memory MB); see admit_job.
+    """
+    if dedupe_key and dedupe_key in inflight_jobs:
+        logger.info(f"Coalescing onto in-flight job {inflight_jobs[dedupe_key]}")
+        job = jobs[inflight_jobs[dedupe_key]]
+        # Someone who didn't ask for it now depends on the job as well
+        job["cancel_on_disconnect"] = job["cancel_on_disconnect"] and cancel_on_disconnect
+        return job
+    
+    reservation = admit_job(kind, client, cost, file_id)
+    job = create_job_record(kind, file_id, cancel_on_disconnect)
+    admitted_jobs[job["job_id"]] = reservation
+    if dedupe_key:
+        inflight_jobs[dedupe_key] = job["job_id"]
+    task = asyncio.create_task(execute_job(job["job_id"], func, *args, dedupe_key=dedupe_key))
+    job_tasks.add(task)
+    task.add_done_callback(job_tasks.discard)
+    touch_job(job["job_id"])
+    return job
+
+def cancel_job(job: dict):
+    """Cancel a queued or running job.
+    
+    A queued job is finished right away. A running job is flagged in the
+    cancel registry; its worker kills ffmpeg or stops Whisper and the job
+    ends as "cancelled" shortly after.
+    """
+    if job["status"] == "queued":
+        job.update({
+            "status": "cancelled",
+            "error": job_error_detail("Processing was cancelled"),
+            "finished_at": datetime.datetime.now().isoformat()
+        })
+        for key in [key for key, job_id in inflight_jobs.items() if job_id == job["job_id"]]:
+            del inflight_jobs[key]
+        logger.info(f"Job {job['job_id']} cancelled while queued")
+        # Lets its execute_job task finish, giving up its admission
+        dispatch_jobs()
+        prune_finished_jobs()
+    elif job["status"] == "running":
+        get_cancel_requests()[job["job_id"]] = True
+        logger.info(f"Cancelling job {job['job_id']}")
+
+def cancel_abandoned_job(job_id: str):
+    """Cancel a cancel_on_disconnect job nobody has followed for JOB_DISCONNECT_GRACE."""
+    job = jobs.get(job_id)
+    if job is None or not job["cancel_on_disconnect"] or job["status"] in FINISHED_JOB_STATUSES:
+        return
+    if job_watchers.get(job_id) or time.monotonic() - job_last_seen.get(job_id, 0) < JOB_DISCONNECT_GRACE:
+        return
+    logger.info(f"Job {job_id} has no clients left")
+    cancel_job(job)
+
+def touch_job(job_id: str):
+    """Note that a client is following a job, and schedule the abandonment check."""
+    job_last_seen[job_id] = time.monotonic()
+    job = jobs.get(job_id)
+    if job is not None and job["cancel_on_disconnect"]:
+        asyncio.get_running_loop().call_later(JOB_DISCONNECT_GRACE, cancel_abandoned_job, job_id)
+
+@contextmanager
+def watch_job(job_id: str):
+    """Count a streaming client as following `job_id` while the block runs."""
+    job_watchers[job_id] = job_watchers.get(job_id, 0) + 1
+    try:
+        yield
+    finally:
+        job_watchers[job_id] -= 1
+        if not job_watchers[job_id]:
+            del job_watchers[job_id]
+        touch_job(job_id)
+
+def complete_job(kind: str, result: dict, file_id: Optional[str] = None) -> dict:
+    """Record a job that was satisfied without running (e.g. from a cache)."""
+    job = create_job_record(kind, file_id)
+    now = datetime.datetime.now().isoformat()
+    job.update({
+        "status": "done",
+        "started_at": now,
+        "finished_at": now,
+        "progress": {"stage": "done", "percent": 100, "eta": 0},
+        "result": result
+    })
+    prune_finished_jobs()
+    return job
+
+def warm_up_worker():
+    """No-op task; submitting it makes the pool spawn (and initialize) a worker."""
+    return os.getpid()
+
+@app.on_event("startup")
+async def warm_up_job_pools():
+    if not WHISPER_PRELOAD_MODELS:
+        return
+    # Workers are spawned on demand, so submit one warm-up task per worker slot
+    # to load the preloaded models before the first real request arrives.
+    for kind, size in JOB_POOL_SIZES.items():
+        pool = get_job_pool(kind)
+        for _ in range(size):
+            pool.submit(warm_up_worker)
+    logger.info(f"Preloading Whisper models: {', '.join(WHISPER_PRELOAD_MODELS)}")
+
+@app.on_event("shutdown")
+def shutdown_job_pools():
+    for kind, pool in job_pools.items():
+        logger.info(f"Shutting down {kind} pool")
+        pool.shutdown(wait=False, cancel_futures=True)
+    job_pools.clear()
+    if progress_queue is not None:
+        progress_queue.put(None)
+    if cancel_manager is not None:
+        cancel_manager.shutdown()
+
+# Admission control
+#
+# Every job is costed from the probe of its source before it is queued: an
+# estimate of the worker seconds it will take and of the memory it will use.
+# A job is only admitted while the estimated work left in its kind's queue fits
+# ADMISSION_MAX_BACKLOG per worker (and its client's share of that), otherwise
+# the request is answered with a 429 and a Retry-After of the time the excess
+# should take to drain. Admitted jobs then wait for a worker slot in
+# dispatch_jobs, which starts them fairly between clients and only while their
+# memory estimate fits. Estimates are corrected by how long finished jobs
+# actually ran.
+
+# Worker time of each encoding profile relative to "standard", and of each
+# Whisper model relative to "medium" (on CPU)
+PROFILE_COST_WEIGHTS = {"preview": 0.15, "standard": 1.0, "archive": 2.0}
+# Subject analysis only decodes, at low resolution and without deblocking
+SUBJECT_ANALYSIS_COST_WEIGHT = 0.1
+WHISPER_MODEL_COST_WEIGHTS = {"tiny": 0.06, "base": 0.12, "small": 0.35, "medium": 1.0}
+REFERENCE_MEGAPIXELS = 1920 * 1080 / 1e6
+# An x264 encode holds about this many frames (lookahead, B-frames and filter
+# buffers) on top of the memory of ffmpeg itself
+ENCODER_FRAMES_IN_FLIGHT = 40
+ENCODER_BASE_MEMORY_MB = 150
+
+# job id -> {kind, client, file_id, estimate, seconds, memory_mb, started} of every
+# admitted job (and transcription request) until it finishes
+admitted_jobs = {}
+# Observed over estimated run time of finished jobs, per kind
+cost_calibration = {kind: 1.0 for kind in JOB_POOL_SIZES}
+# Admitted jobs waiting for a worker slot as (job, future), in arrival order,
+# and the jobs holding one
+waiting_jobs = []
+running_jobs = {}
+
+def client_id(request: Request) -> str:
+    """Identify who a request is accounted to for admission and fairness."""
+    if ADMISSION_CLIENT_HEADER:
+        value = request.headers.get(ADMISSION_CLIENT_HEADER)
+        if value:
+            # The first address of X-Forwarded-For is the original client
+            return value.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+def clip_seconds(media_info: dict, start: Optional[float], end: Optional[float]) -> float:
+    return max((end if end is not None else media_info["duration"]) - (start or 0), 0)
+
+def estimate_transcription_cost(media_info: dict, model_name: Optional[str], start: Optional[float] = None, end: Optional[float] = None) -> tuple:
+    """Estimate the (worker seconds, memory MB) of transcribing a source."""
+    model_name = model_name or WHISPER_MODEL_NAME
+    seconds = clip_seconds(media_info, start, end)
+    work = seconds * TRANSCRIBE_COST_FACTOR * WHISPER_MODEL_COST_WEIGHTS[model_name]
+    model_mb = WHISPER_MODEL_SIZES_MB[model_name]
+    if TRANSCRIBE_PARALLEL and seconds > 2 * TRANSCRIBE_CHUNK_SECONDS:
+        # Chunks are transcribed side by side, each worker with its own model
+        work /= TRANSCRIBE_CHUNK_WORKERS
+        model_mb *= TRANSCRIBE_CHUNK_WORKERS
+    # The model plus the 16 kHz float32 samples Whisper decodes the audio into
+    memory_mb = model_mb + seconds * 16000 * 4 / (1024 * 1024)
+    return work, memory_mb
+
+def estimate_render_cost(media_info: dict, outputs: list, content_hash: Optional[str] = None, incremental: bool = False) -> tuple:
+    """Estimate the (worker seconds, memory MB) of one job rendering `outputs`.
+    
+    `outputs` are the render parameters of each output; they share one decode
+    and one transcription. Renders scale with duration x megapixels x frame
+    rate; transcription is left out when its result is already cached.
+    `incremental` renders are encoded in segments for a segment store.
+    """
+    megapixels = media_info["width"] * media_info["height"] / 1e6
+    frame_rate = (media_info.get("fps") or 30) / 30
+    work = memory_mb = 0
+    for render_data in outputs:
+        params = canonical_render_params(render_data)
+        seconds = clip_seconds(media_info, params["start"], params["end"])
+        work += seconds * RENDER_COST_FACTOR * megapixels / REFERENCE_MEGAPIXELS * frame_rate * PROFILE_COST_WEIGHTS[params["profile"]]
+        memory_mb += ENCODER_BASE_MEMORY_MB + megapixels * 1.5 * ENCODER_FRAMES_IN_FLIGHT
+    
+    parallel = outputs[0].get('parallel')
+    segmented = incremental or (RENDER_PARALLEL if parallel is None else parallel)
+    if len(outputs) == 1 and segmented and not outputs[0].get('stream'):
+        # Segments are encoded side by side: less wall time, more encoders
+        work /= RENDER_SEGMENT_WORKERS
+        memory_mb *= RENDER_SEGMENT_WORKERS
+    
+    params = canonical_render_params(outputs[0])
+    if params["language"]:
+        language = {"hebrew": "he", "english": "en"}.get(params["language"], params["language"])
+        cache_path = content_hash and get_transcription_cache_path(content_hash, language, params["model"], params["start"], params["end"])
+        if not (cache_path and cache_path.exists()):
+            transcription_work, transcription_memory_mb = estimate_transcription_cost(media_info, params["model"], params["start"], params["end"])
+            work += transcription_work
+            memory_mb = max(memory_mb, transcription_memory_mb)
+    return work, memory_mb
+
+def estimate_subject_analysis_cost(media_info: dict) -> tuple:
+    """Estimate the (worker seconds, memory MB) of analyzing a source for auto_crop."""
+    megapixels = media_info["width"] * media_info["height"] / 1e6
+    work = media_info["duration"] * RENDER_COST_FACTOR * megapixels / REFERENCE_MEGAPIXELS * SUBJECT_ANALYSIS_COST_WEIGHT
+    return work, ENCODER_BASE_MEMORY_MB
+
+def remaining_work(reservation: dict) -> float:
+    """Estimated worker seconds an admitted job still needs."""
+    if reservation["started"] is None:
+        return reservation["seconds"]
+    return max(reservation["seconds"] - (time.monotonic() - reservation["started"]), 0)
+
+def admission_backlog(kind: str, client: Optional[str] = None) -> float:
+    """Estimated worker seconds of admitted `kind` work left, optionally of one client only."""
+    return sum(
+        remaining_work(reservation) for reservation in list(admitted_jobs.values())
+        if reservation["kind"] == kind and (client is None or reservation["client"] == client)
+    )
+
+def running_memory_mb() -> float:
+    return sum(admitted_jobs[job_id]["memory_mb"] for job_id in running_jobs if job_id in admitted_jobs)
+
+def reject_job(kind: str, reason: str, excess: float):
+    """Refuse a job with a 429, retrying once `excess` worker seconds have drained."""
+    retry_after = max(1, int(excess / JOB_POOL_SIZES[kind] + 0.999))
+    record_metric("admission_requests_total", 1, kind=kind, result=f"rejected_{reason}")
+    logger.info(f"Rejected {kind} job ({reason} backlog full), retry after {retry_after}s")
+    raise HTTPException(
+        status_code=429,
+        detail={
+            "message": f"The server is busy, please try again in {retry_after // 60} min" if retry_after >= 120 else f"The server is busy, please try again in {retry_after} s",
+            "error": "Too many requests from this client" if reason == "client" else "Job queue is full",
+            "can_retry": True,
+            "retry_after": retry_after
+        },
+        headers={"Retry-After": str(retry_after)}
+    )
+
+def admit_job(kind: str, client: Optional[str], cost: tuple, file_id: Optional[str] = None) -> dict:
+    """Admit a job of estimated `cost` for `client`, or raise a 429.
+    
+    Returns the reservation to keep in admitted_jobs while the job is queued or
+    running; its `file_id` keeps the upload safe from the storage janitor. A job is always admitted into an empty queue, and a client's job
+    when it has nothing else queued, so no job is too large to ever run.
+    """
+    estimate, memory_mb = cost
+    seconds = estimate * cost_calibration[kind]
+    if ADMISSION_MAX_BACKLOG:
+        budget = ADMISSION_MAX_BACKLOG * JOB_POOL_SIZES[kind]
+        backlog = admission_backlog(kind)
+        if backlog and backlog + seconds > budget:
+            reject_job(kind, "server", backlog + seconds - budget)
+        client_backlog = admission_backlog(kind, client)
+        if ADMISSION_CLIENT_SHARE and client_backlog and client_backlog + seconds > budget * ADMISSION_CLIENT_SHARE:
+            reject_job(kind, "client", client_backlog + seconds - budget * ADMISSION_CLIENT_SHARE)
+    record_metric("admission_requests_total", 1, kind=kind, result="admitted")
+    return {"kind": kind, "client": client, "file_id": file_id, "estimate": estimate, "seconds": seconds, "memory_mb": memory_mb, "started": None}
+
+def calibrate_cost(job_id: str, elapsed: float):
+    """Fold the actual run time of a finished job into the estimates of its kind."""
+    reservation = admitted_jobs.get(job_id)
+    # Short jobs are dominated by fixed overheads and would skew the factor
+    if reservation is None or reservation["estimate"] < 5:
+        return
+    kind = reservation["kind"]
+    ratio = min(max(elapsed / reservation["estimate"], 0.05), 20)
+    cost_calibration[kind] = 0.8 * cost_calibration[kind] + 0.2 * ratio
+
+def dispatch_jobs():
+    """Start waiting jobs while their kind has free worker slots and memory allows.
+    
+    Jobs are taken in order of how many jobs their client already has running
+    (then in arrival order), so one client's burst cannot occupy every worker
+    while other clients wait. A job whose estimated memory does not fit next to
+    the running jobs holds back those after it until memory frees up, rather
+    than being overtaken forever by smaller jobs.
+    """
+    for entry in [entry for entry in waiting_jobs if entry[0]["status"] == "cancelled"]:
+        waiting_jobs.remove(entry)
+        if not entry[1].done():
+            entry[1].set_result(False)
+    while waiting_jobs:
+        running_per_kind = {kind: 0 for kind in JOB_POOL_SIZES}
+        running_per_client = {}
+        for job in running_jobs.values():
+            running_per_kind[job["kind"]] += 1
+            client = admitted_jobs.get(job["job_id"], {}).get("client")
+            running_per_client[client] = running_per_client.get(client, 0) + 1
+        candidates = [entry for entry in waiting_jobs if running_per_kind[entry[0]["kind"]] < JOB_POOL_SIZES[entry[0]["kind"]]]
+        if not candidates:
+            return
+        job, future = min(
+            candidates,
+            key=lambda entry: running_per_client.get(admitted_jobs.get(entry[0]["job_id"], {}).get("client"), 0)
+        )
+        reservation = admitted_jobs.get(job["job_id"])
+        memory_mb = reservation["memory_mb"] if reservation else 0
+        if ADMISSION_MEMORY_MB and running_jobs and running_memory_mb() + memory_mb > ADMISSION_MEMORY_MB:
+            return
+        waiting_jobs.remove((job, future))
+        running_jobs[job["job_id"]] = job
+        if reservation:
+            reservation["started"] = time.monotonic()
+        future.set_result(True)
+
+async def acquire_job_slot(job: dict) -> bool:
+    """Wait until dispatch_jobs starts `job`; False if it was cancelled while waiting."""
+    future = asyncio.get_running_loop().create_future()
+    waiting_jobs.append((job, future))
+    dispatch_jobs()
+    try:
+        return await future
+    except asyncio.CancelledError:
+        if (job, future) in waiting_jobs:
+            waiting_jobs.remove((job, future))
+        else:
+            release_job_slot(job)
+        raise
+
+def release_job_slot(job: dict):
+    if running_jobs.pop(job["job_id"], None) is not None:
+        dispatch_jobs()
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/upload")
-async def upload_video(file: UploadFile = File(...)):
-    if not file.content_type.startswith('video/'):
-        raise HTTPException(status_code=400, detail="File must be a video")
+# Upload registry
+#
+# Every upload has a row in a SQLite database keyed by file_id: where its file
+# is, its size, content hash, probe summary, creation time and state
+# ("uploading" while a resumable upload is in progress, then "ready", and
+# "deleted" once its file is removed). Lookups are O(1) and survive restarts.
+def upload_db() -> sqlite3.Connection:
+    # A short-lived connection per operation keeps this safe across threads and worker processes
+    db = sqlite3.connect(UPLOAD_DB_PATH, timeout=30)
+    db.row_factory = sqlite3.Row
+    return db
+
+def init_upload_registry():
+    """Create the registry, importing uploads that were stored before it existed."""
+    with closing(upload_db()) as db, db:
+        db.execute("PRAGMA journal_mode=WAL")
+        exists = db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'uploads'").fetchone()
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS uploads (
+                file_id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_hash TEXT,
+                probe TEXT,
+                state TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        if exists:
+            return
+        for path in UPLOAD_DIR.iterdir():
+            file_id, _, filename = path.name.partition("_")
+            if path.is_file() and filename:
+                stat = path.stat()
+                db.execute(
+                    "INSERT OR IGNORE INTO uploads VALUES (?, ?, ?, ?, NULL, NULL, 'ready', ?, ?)",
+                    (file_id, filename, str(path), stat.st_size, stat.st_mtime, stat.st_mtime)
+                )
+        for meta_path in PARTIAL_UPLOAD_DIR.glob("*.json"):
+            data_path = meta_path.with_suffix(".part")
+            if data_path.exists():
+                meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                stat = data_path.stat()
+                db.execute(
+                    "INSERT OR IGNORE INTO uploads VALUES (?, ?, ?, ?, NULL, NULL, 'uploading', ?, ?)",
+                    (meta_path.stem, meta["filename"], str(data_path), meta["size"], stat.st_mtime, stat.st_mtime)
+                )
+            meta_path.unlink()
+
+def register_upload(file_id: str, filename: str, path: Path, size: int, state: str, content_hash: Optional[str] = None):
+    now = time.time()
+    with closing(upload_db()) as db, db:
+        db.execute(
+            "INSERT INTO uploads VALUES (?, ?, ?, ?, ?, NULL, ?, ?, ?)",
+            (file_id, filename, str(path), size, content_hash, state, now, now)
+        )
+
+# find_upload refreshes updated_at only once it is this many seconds old
+UPLOAD_TOUCH_INTERVAL = 60
+
+def update_upload(file_id: str, **fields):
+    if "probe" in fields:
+        fields["probe"] = json.dumps(fields["probe"])
+    if "path" in fields:
+        fields["path"] = str(fields["path"])
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with closing(upload_db()) as db, db:
+        db.execute(f"UPDATE uploads SET {assignments} WHERE file_id = ?", (*fields.values(), file_id))
+
+def get_upload(file_id: str) -> Optional[dict]:
+    with closing(upload_db()) as db:
+        row = db.execute("SELECT * FROM uploads WHERE file_id = ?", (file_id,)).fetchone()
+    if row is None:
+        return None
+    upload = dict(row)
+    upload["path"] = Path(upload["path"])
+    upload["probe"] = json.loads(upload["probe"]) if upload["probe"] else None
+    return upload
+
+def list_uploads(states: tuple) -> list:
+    with closing(upload_db()) as db:
+        rows = db.execute(
+            f"SELECT file_id, path, state, updated_at FROM uploads WHERE state IN ({', '.join('?' * len(states))})",
+            states
+        ).fetchall()
+    return [{**dict(row), "path": Path(row["path"])} for row in rows]
+
+def find_upload(file_id: str) -> Optional[Path]:
+    """Return the path of a ready upload, or None if it is unknown or gone.
+
+    A lookup counts as a use: it refreshes the upload's `updated_at`, which
+    the storage janitor uses for TTL and LRU eviction. To keep lookups
+    read-only, that write happens at most every UPLOAD_TOUCH_INTERVAL seconds.
+    Uploads whose file is gone are marked deleted by the janitor.
+    """
+    upload = get_upload(file_id)
+    if upload is None or upload["state"] != "ready" or not upload["path"].exists():
+        return None
+    if time.time() - upload["updated_at"] > UPLOAD_TOUCH_INTERVAL:
+        update_upload(file_id)
+    return upload["path"]
+
+def get_upload_hash(file_id: str, input_path: Path) -> str:
+    """Content hash of an upload, computed once and then kept in the registry."""
+    upload = get_upload(file_id)
+    if upload and upload["content_hash"]:
+        return upload["content_hash"]
+    content_hash = get_file_hash(str(input_path))
+    update_upload(file_id, content_hash=content_hash)
+    return content_hash
+
+def delete_upload(file_id: str, input_path: Path):
+    """Remove an upload's file and mark it deleted in the registry."""
+    try:
+        if input_path.exists():
+            input_path.unlink()
+            print(f"Cleaned up input file: {input_path}")
+    finally:
+        update_upload(file_id, state="deleted")
+
+init_upload_registry()
+
+# Storage janitor
+#
+# Every JANITOR_INTERVAL seconds, files older than their TTL are removed, then
+# the least recently used uploads, outputs and transcripts go until together they
+# fit in STORAGE_MAX_BYTES. Uploads of queued or running jobs (and their partial
+# outputs) are pinned; other in-progress temp files are only removed by TTL.
+STORAGE_TTLS = {
+    "uploads": UPLOAD_TTL_SECONDS,
+    "outputs": OUTPUT_TTL_SECONDS,
+    "transcripts": TRANSCRIPT_TTL_SECONDS,
+    "temp": TEMP_FILE_TTL_SECONDS,
+}
+
+janitor_stats = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_run_seconds": None,
+    "storage_bytes": {kind: 0 for kind in STORAGE_TTLS},
+    "reclaimed_bytes": {kind: 0 for kind in STORAGE_TTLS},
+    "deleted_files": {kind: 0 for kind in STORAGE_TTLS},
+}
+janitor_task = None
+
+def storage_entry_stat(path: Path) -> tuple:
+    """Return (size, last modified) of a file, or of everything inside a directory."""
+    if path.is_dir():
+        stats = [child.stat() for child in path.rglob("*") if child.is_file()] or [path.stat()]
+        return sum(stat.st_size for stat in stats), max(stat.st_mtime for stat in stats)
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime
+
+def remove_storage_path(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+
+def collect_storage_entries(active_jobs: set, active_uploads: set) -> list:
+    entries = []
+    for upload in list_uploads(("uploading", "ready")):
+        path = upload["path"]
+        try:
+            size, modified = storage_entry_stat(path)
+        except FileNotFoundError:
+            update_upload(upload["file_id"], state="deleted")
+            continue
+        entries.append({
+            "kind": "uploads",
+            "path": path,
+            "size": size,
+            "last_used": max(modified, upload["updated_at"]),
+            "pinned": upload["file_id"] in active_uploads,
+            "remove": lambda upload=upload: delete_upload(upload["file_id"], upload["path"]),
+        })
     
-    # Generate unique filename
-    file_id = str(uuid.uuid4())
-    input_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
-    output_path = OUTPUT_DIR / f"cropped_{file_id}.mp4"
+    for directory, kind in ((OUTPUT_DIR, "outputs"), (TRANSCRIPTS_DIR, "transcripts")):
+        for path in directory.iterdir():
+            # Partial renders, parallel segments and subtitle scratch files are temporary
+            temporary = path.name.startswith(("partial_", "segments_", "temp_"))
+            try:
+                size, modified = storage_entry_stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append({
+                "kind": "temp" if temporary else kind,
+                "path": path,
+                "size": size,
+                "last_used": modified,
+                "pinned": temporary and path.stem.removeprefix("partial_") in active_jobs,
+                "remove": lambda path=path: remove_storage_path(path),
+            })
+    return entries
+
+def run_janitor():
+    """Apply the TTLs and the global storage budget once."""
+    started = time.monotonic()
+    now = time.time()
+    active = [job for job in list(jobs.values()) if job["status"] in ("queued", "running")]
+    # Admitted work includes synchronous requests (/transcribe), which have no job record
+    admitted = list(admitted_jobs.items())
+    entries = collect_storage_entries(
+        {job["job_id"] for job in active} | {job_id for job_id, _ in admitted},
+        {job["file_id"] for job in active if job["file_id"]} | {reservation["file_id"] for _, reservation in admitted if reservation["file_id"]}
+    )
     
-    # Save uploaded file
-    with open(input_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
+    def remove(entry) -> bool:
+        try:
+            entry["remove"]()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Janitor could not remove {entry['path']}: {e}")
+            return False
+        janitor_stats["reclaimed_bytes"][entry["kind"]] += entry["size"]
+        janitor_stats["deleted_files"][entry["kind"]] += 1
+        logger.info(f"Janitor removed {entry['kind']} entry {entry['path']} ({entry['size']} bytes)")
+        return True
+    
+    remaining = []
+    for entry in entries:
+        ttl = STORAGE_TTLS[entry["kind"]]
+        expired = ttl and now - entry["last_used"] > ttl
+        if entry["pinned"] or not expired or not remove(entry):
+            remaining.append(entry)
+    
+    total_size = sum(entry["size"] for entry in remaining)
+    for entry in sorted(remaining, key=lambda entry: entry["last_used"]):
+        if total_size <= STORAGE_MAX_BYTES:
+            break
+        if entry["pinned"] or entry["kind"] == "temp" or not remove(entry):
+            continue
+        remaining.remove(entry)
+        total_size -= entry["size"]
+    
+    janitor_stats["storage_bytes"] = {
+        kind: sum(entry["size"] for entry in remaining if entry["kind"] == kind) for kind in STORAGE_TTLS
+    }
+    janitor_stats["runs"] += 1
+    janitor_stats["last_run_at"] = datetime.datetime.now().isoformat()
+    janitor_stats["last_run_seconds"] = round(time.monotonic() - started, 3)
+
+async def janitor_loop():
+    while True:
+        try:
+            await asyncio.to_thread(run_janitor)
+        except Exception as e:
+            logger.error(f"Janitor run failed: {e}", exc_info=True)
+        await asyncio.sleep(JANITOR_INTERVAL)
+
+@app.on_event("startup")
+async def start_janitor():
+    global janitor_task
+    if JANITOR_INTERVAL > 0:
+        janitor_task = asyncio.create_task(janitor_loop())
+
+@app.on_event("shutdown")
+def stop_janitor():
+    if janitor_task is not None:
+        janitor_task.cancel()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Expose counters, gauges and stage timing histograms in the Prometheus text format."""
+    return Response(content=format_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/storage")
+async def get_storage_status():
+    """Report disk usage per storage kind and what the janitor has reclaimed."""
+    return {"max_bytes": STORAGE_MAX_BYTES, "ttl_seconds": STORAGE_TTLS, **janitor_stats}
+
+def record_upload_metrics(size: int, elapsed: float):
+    record_metric("upload_bytes_total", size)
+    if elapsed > 0:
+        record_metric("upload_throughput_bytes_per_second", size / elapsed)
+
+def write_upload_chunk(buffer, chunk: bytes, digest=None):
+    """Write (and hash) one chunk of an upload; called on a thread to keep disk I/O off the event loop."""
+    buffer.write(chunk)
+    if digest is not None:
+        digest.update(chunk)
+
+def finalize_upload(file_id: str, filename: str, input_path: Path) -> dict:
+    """Probe a fully written upload and build the upload response.
     
+    The probe reads the whole file, so call it on a thread.
+    """
     try:
-        # Get video dimensions
-        width, height = get_video_dimensions(str(input_path))
+        # Probe once; crops and renders of this upload reuse the cached result
+        media_info = get_media_info(str(input_path))
+        update_upload(file_id, probe=media_summary(media_info))
         return {
             "file_id": file_id,
-            "original_filename": file.filename,
-            "dimensions": {"width": width, "height": height}
+            "original_filename": filename,
+            "dimensions": {"width": media_info["width"], "height": media_info["height"]},
+            "media": media_summary(media_info)
         }
     except Exception as e:
-        input_path.unlink()
+        delete_upload(file_id, input_path)
         raise HTTPException(status_code=400, detail=str(e))
 
-@app.post("/crop/{file_id}")
-async def crop_video_endpoint(
-    file_id: str, 
-    target_ratio: str, 
-    position: float = 50, 
-    volume: float = 100,
-    language: Optional[str] = None,
-    burn_subtitles: bool = False
-):
-    print(f"Processing crop request for file_id: {file_id}, target_ratio: {target_ratio}, position: {position}, volume: {volume}%, language: {language}, burn_subtitles: {burn_subtitles}")
+@app.post("/upload")
+async def upload_video(file: UploadFile = File(...)):
+    if not file.content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    
+    # Generate unique filename
+    file_id = str(uuid.uuid4())
+    input_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
     
-    if target_ratio not in ["9:16", "16:9"]:
-        raise HTTPException(status_code=400, detail="Invalid aspect ratio")
+    # Stream the uploaded file to disk chunk by chunk, hashing it on the way
+    digest = hashlib.sha256()
+    started = time.monotonic()
+    with open(input_path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await asyncio.to_thread(write_upload_chunk, buffer, chunk, digest)
+        record_upload_metrics(buffer.tell(), time.monotonic() - started)
+    remember_file_hash(str(input_path), digest.hexdigest())
+    register_upload(file_id, file.filename, input_path, input_path.stat().st_size, "ready", digest.hexdigest())
     
-    if not 0 <= position <= 100:
-        raise HTTPException(status_code=400, detail="Position must be between 0 and 100")
+    return await asyncio.to_thread(finalize_upload, file_id, file.filename, input_path)
 
-    if not 0 <= volume <= 300:
-        raise HTTPException(status_code=400, detail="Volume must be between 0 and 300")
-        
-    if language and language not in ["hebrew", "english"]:
-        raise HTTPException(status_code=400, detail="Language must be either 'hebrew' or 'english'")
+# Resumable uploads
+#
+# A large file can be sent as a series of chunks: POST /upload/init reserves a
+# file_id, PUT /upload/{file_id}?offset=N appends the request body at offset N,
+# GET /upload/{file_id} reports how many bytes arrived (to resume after a dropped
+# connection), and POST /upload/{file_id}/complete turns it into a regular upload.
+def get_partial_upload(file_id: str):
+    """Return the data path and registry entry of an in-progress upload."""
+    upload = get_upload(file_id)
+    if upload is None or upload["state"] != "uploading" or not upload["path"].exists():
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload["path"], upload
+
+def upload_status(file_id: str, data_path: Path, meta: dict) -> dict:
+    return {
+        "file_id": file_id,
+        "offset": data_path.stat().st_size,
+        "size": meta["size"],
+        "chunk_size": UPLOAD_CHUNK_SIZE
+    }
+
+@app.post("/upload/init")
+async def init_upload(upload_data: dict = Body(...)):
+    filename = Path(upload_data.get('filename') or '').name
+    content_type = upload_data.get('content_type') or ''
+    size = upload_data.get('size')
     
-    # Find the uploaded file
-    input_files = list(UPLOAD_DIR.glob(f"{file_id}_*"))
-    print(f"Found input files: {input_files}")
+    if not content_type.startswith('video/'):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Filename is required")
+    if not isinstance(size, int) or size <= 0:
+        raise HTTPException(status_code=400, detail="Size must be a positive integer")
     
-    if not input_files:
-        raise HTTPException(status_code=404, detail="File not found")
+    file_id = str(uuid.uuid4())
+    data_path = PARTIAL_UPLOAD_DIR / f"{file_id}.part"
+    data_path.touch()
+    register_upload(file_id, filename, data_path, size, "uploading")
+    
+    logger.info(f"Started resumable upload {file_id} for {filename} ({size} bytes)")
+    return upload_status(file_id, data_path, {"filename": filename, "size": size})
+
+@app.get("/upload/{file_id}")
+async def get_upload_status(file_id: str):
+    data_path, meta = get_partial_upload(file_id)
+    return upload_status(file_id, data_path, meta)
+
+@app.put("/upload/{file_id}")
+async def upload_chunk(file_id: str, request: Request, offset: int):
+    data_path, meta = get_partial_upload(file_id)
+    received = data_path.stat().st_size
+    
+    # Chunks may be re-sent, but never leave a gap in the file
+    if offset < 0 or offset > received:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Chunk offset does not match the uploaded data",
+                "offset": received
+            }
+        )
+    
+    started = time.monotonic()
+    with open(data_path, "r+b") as buffer:
+        buffer.seek(offset)
+        async for chunk in request.stream():
+            if buffer.tell() + len(chunk) > meta["size"]:
+                raise HTTPException(status_code=400, detail="Chunk exceeds declared file size")
+            await asyncio.to_thread(write_upload_chunk, buffer, chunk)
+        record_upload_metrics(buffer.tell() - offset, time.monotonic() - started)
+    
+    return upload_status(file_id, data_path, meta)
+
+@app.post("/upload/{file_id}/complete")
+async def complete_upload(file_id: str):
+    data_path, meta = get_partial_upload(file_id)
+    received = data_path.stat().st_size
+    if received != meta["size"]:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": "Upload is incomplete",
+                "offset": received
+            }
+        )
     
-    input_path = input_files[0]
-    output_path = OUTPUT_DIR / f"cropped_{file_id}.mp4"
+    input_path = UPLOAD_DIR / f"{file_id}_{meta['filename']}"
+    data_path.rename(input_path)
+    update_upload(file_id, path=input_path, state="ready")
+    logger.info(f"Completed resumable upload {file_id}: {input_path}")
+    
+    return await asyncio.to_thread(finalize_upload, file_id, meta["filename"], input_path)
+
+def process_crop(file_id: str, input_path: str, target_ratio: str, position: float = 50, volume: float = 100, language: Optional[str] = None, burn_subtitles: bool = False, model_name: Optional[str] = None, profile: Optional[str] = None, parallel: Optional[bool] = None, start: Optional[float] = None, end: Optional[float] = None, auto_crop: bool = False):
+    """Crop job: crop the upload (or its start/end range) and optionally write transcript files."""
+    input_path = Path(input_path)
+    # Named per job: crops of the same upload may run at the same time
+    output_id = current_job_id or uuid.uuid4()
+    output_path = OUTPUT_DIR / f"cropped_{output_id}.mp4"
     
     print(f"Input path: {input_path}")
     print(f"Output path: {output_path}")
@@ -411,7 +3124,7 @@ async def crop_video_endpoint(
             raise PermissionError(f"Cannot write to output directory: {e}")
         
         # Process video
-        crop_video(str(input_path), str(output_path), target_ratio, position, volume, language, burn_subtitles)
+        crop_video(str(input_path), str(output_path), target_ratio, position, volume, language, burn_subtitles, model_name=model_name, profile=profile, parallel=parallel, start=start, end=end, auto_crop=auto_crop)
         
         # Verify output file was created
         if not output_path.exists():
@@ -422,19 +3135,21 @@ async def crop_video_endpoint(
         if language and not burn_subtitles:
             try:
                 print(f"Starting transcription in {language}")
-                result = transcribe_audio(str(input_path), language)
+                result = transcribe_audio(str(input_path), language, model_name, start=start, end=end)
                 
                 # Create SRT file
-                srt_path = TRANSCRIPTS_DIR / f"transcript_{file_id}.srt"
+                srt_path = TRANSCRIPTS_DIR / f"transcript_{output_id}.srt"
                 create_srt_file(result["segments"], srt_path)
                 transcript_files["srt"] = str(srt_path)
                 
                 # Create TXT file
-                txt_path = TRANSCRIPTS_DIR / f"transcript_{file_id}.txt"
+                txt_path = TRANSCRIPTS_DIR / f"transcript_{output_id}.txt"
                 create_txt_file(result["segments"], txt_path)
                 transcript_files["txt"] = str(txt_path)
                 
                 print(f"Transcription completed: {transcript_files}")
+            except JobCancelled:
+                raise
             except Exception as e:
                 print(f"Transcription error: {str(e)}")
                 logger.error(f"Transcription failed: {str(e)}")
@@ -451,39 +3166,283 @@ async def crop_video_endpoint(
                 output_path.unlink()
             except:
                 pass
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        try:
-            if input_path.exists():
-                input_path.unlink()
-                print(f"Cleaned up input file: {input_path}")
-        except Exception as e:
-            print(f"Warning: Could not clean up input file: {e}")
+        raise
+
+@app.post("/crop/{file_id}")
+async def crop_video_endpoint(
+    request: Request,
+    file_id: str, 
+    target_ratio: str, 
+    position: float = 50, 
+    volume: float = 100,
+    language: Optional[str] = None,
+    burn_subtitles: bool = False,
+    model: Optional[str] = None,
+    profile: Optional[str] = None,
+    parallel: Optional[bool] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    auto_crop: bool = False,
+    cancel_on_disconnect: bool = JOB_CANCEL_ON_DISCONNECT
+):
+    print(f"Processing crop request for file_id: {file_id}, target_ratio: {target_ratio}, position: {position}, volume: {volume}%, language: {language}, burn_subtitles: {burn_subtitles}")
+    
+    if target_ratio not in ["9:16", "16:9"]:
+        raise HTTPException(status_code=400, detail="Invalid aspect ratio")
+    
+    if not 0 <= position <= 100:
+        raise HTTPException(status_code=400, detail="Position must be between 0 and 100")
+
+    if not 0 <= volume <= 300:
+        raise HTTPException(status_code=400, detail="Volume must be between 0 and 300")
+        
+    if language and language not in ["hebrew", "english"]:
+        raise HTTPException(status_code=400, detail="Language must be either 'hebrew' or 'english'")
+    
+    validate_model_name(model)
+    validate_encoding_profile(profile)
+    
+    # Find the uploaded file
+    input_path = await asyncio.to_thread(find_upload, file_id)
+    print(f"Found input file: {input_path}")
+    
+    if input_path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    media_info = await asyncio.to_thread(get_media_info, str(input_path))
+    validate_time_range(start, end, media_info["duration"])
+    source_hash = await asyncio.to_thread(get_upload_hash, file_id, input_path)
+    cost = estimate_render_cost(media_info, [{
+        "target_ratio": target_ratio, "language": language, "model": model, "profile": profile,
+        "parallel": parallel, "start": start, "end": end, "auto_crop": auto_crop
+    }], source_hash)
+    
+    job = submit_job(
+        "render", process_crop,
+        file_id, str(input_path), target_ratio, position, volume, language, burn_subtitles, model, profile, parallel, start, end, auto_crop,
+        file_id=file_id, cancel_on_disconnect=cancel_on_disconnect, client=client_id(request), cost=cost
+    )
+    return JSONResponse(status_code=202, content={"job_id": job["job_id"], "status": job["status"]})
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Report the state of a crop or render job: queued, running, done, failed or cancelled."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    touch_job(job_id)
+    return job
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: str):
+    """Cancel a queued or running job, killing its ffmpeg or stopping Whisper."""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in FINISHED_JOB_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    cancel_job(job)
+    return job
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request):
+    """Stream job state and progress (stage, percent, fps, ETA) as Server-Sent Events."""
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_event = None
+        last_sent = time.monotonic()
+        with watch_job(job_id):
+            while not await request.is_disconnected():
+                job = jobs.get(job_id)
+                if job is None:
+                    break
+                event = json.dumps(job)
+                if event != last_event:
+                    yield f"data: {event}\n\n"
+                    last_event = event
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent > JOB_EVENT_KEEPALIVE:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                if job["status"] in FINISHED_JOB_STATUSES:
+                    break
+                await asyncio.sleep(JOB_EVENT_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def file_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+def content_disposition(filename: str) -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+def parse_byte_range(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """Return the inclusive (start, end) of a single `bytes=` range, or None to send the whole file.
+
+    Multiple ranges, other units and invalid ranges (such as `bytes=5-3`) are
+    ignored, as RFC 7233 allows; a range that starts past the end of the file
+    is answered with 416.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+        else:
+            # Suffix range: the final `last` bytes
+            start = max(size - int(last), 0)
+            end = size - 1 if int(last) else -1
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+def iter_file_range(file_path: Path, start: int, length: int):
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(DOWNLOAD_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
 
 @app.get("/download/{filename}")
-async def download_file(filename: str):
+async def download_file(filename: str, request: Request):
+    """Serve a result file, with ETag validation and single byte-range (206) support."""
     # Check both OUTPUT_DIR and TRANSCRIPTS_DIR
     file_path = OUTPUT_DIR / filename
     if not file_path.exists():
         file_path = TRANSCRIPTS_DIR / filename
         if not file_path.exists():
             raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, filename=filename)
+    
+    stat = file_path.stat()
+    etag = file_etag(stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Last-Modified": last_modified}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    byte_range = parse_byte_range(request.headers.get("range"), stat.st_size)
+    # If-Range: only resume when the client's copy is still the current file
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range and if_range not in (etag, last_modified):
+        byte_range = None
+    if byte_range is None:
+        return FileResponse(file_path, filename=filename, headers=headers)
+    
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": content_disposition(filename)
+    })
+    return StreamingResponse(
+        iter_file_range(file_path, start, end - start + 1),
+        status_code=206,
+        media_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        headers=headers
+    )
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job_output(job_id: str, request: Request):
+    """Stream a render's fragmented MP4 output while ffmpeg is still writing it.
+
+    Only renders submitted with `stream` enabled can be followed before they
+    finish; the finished output of any job is served like a download.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "done":
+        if not job["result"].get("output_file"):
+            # e.g. a subject analysis job
+            raise HTTPException(status_code=404, detail="Job has no output file")
+        return await download_file(Path(job["result"]["output_file"]).name, request)
+    if job["status"] in ("failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=job["error"])
+    if not job.get("streamable"):
+        raise HTTPException(status_code=409, detail="Job was not submitted with streaming enabled")
+    
+    partial_path = OUTPUT_DIR / f"partial_{job_id}.mp4"
+    
+    async def tail_output():
+        handle = None
+        with watch_job(job_id):
+            try:
+                while not await request.is_disconnected():
+                    job = jobs.get(job_id)
+                    finished = job is None or job["status"] in FINISHED_JOB_STATUSES
+                    if handle is None:
+                        # The encode renames its partial file when done; an open handle keeps reading it
+                        if job is not None and job["status"] == "done":
+                            handle = open(job["result"]["output_file"], "rb")
+                        elif partial_path.exists():
+                            handle = open(partial_path, "rb")
+                        elif finished:
+                            break
+                        else:
+                            await asyncio.sleep(JOB_EVENT_INTERVAL)
+                            continue
+                    chunk = await asyncio.to_thread(handle.read, DOWNLOAD_CHUNK_SIZE)
+                    if chunk:
+                        yield chunk
+                    elif finished:
+                        break
+                    else:
+                        await asyncio.sleep(JOB_EVENT_INTERVAL)
+            finally:
+                if handle is not None:
+                    handle.close()
+    
+    return StreamingResponse(tail_output(), media_type="video/mp4", headers={"Cache-Control": "no-cache"})
 
 @app.post("/confirm-download/{file_id}")
-async def confirm_download(file_id: str):
+async def confirm_download(file_id: str, job_id: Optional[str] = None):
+    """Remove an upload and the crop output of `job_id` (or of all its finished jobs) once downloaded."""
     try:
         # Remove uploaded file
-        uploaded_files = list(UPLOAD_DIR.glob(f"{file_id}_*"))
-        for file in uploaded_files:
+        upload = get_upload(file_id)
+        if upload is not None and upload["state"] != "deleted":
             try:
-                file.unlink()
-                logger.info(f"Removed uploaded file: {file}")
+                delete_upload(file_id, upload["path"])
+                logger.info(f"Removed uploaded file: {upload['path']}")
             except Exception as e:
-                logger.error(f"Error removing uploaded file {file}: {str(e)}")
+                logger.error(f"Error removing uploaded file {upload['path']}: {str(e)}")
 
-        # Remove output file
-        output_files = list(OUTPUT_DIR.glob(f"cropped_{file_id}.mp4"))
+        # Remove the crop outputs of the job(s); jobs still running keep theirs
+        finished = [
+            job for job in jobs.values()
+            if job["file_id"] == file_id and job["status"] == "done" and (job_id is None or job["job_id"] == job_id)
+        ]
+        output_files = [
+            Path(job["result"]["output_file"]) for job in finished
+            if Path(job["result"].get("output_file") or "").name.startswith("cropped_")
+            and Path(job["result"]["output_file"]).exists()
+        ]
         for file in output_files:
             try:
                 file.unlink()
@@ -498,22 +3457,36 @@ async def confirm_download(file_id: str):
 
 @app.post("/transcribe/{file_id}")
 async def transcribe_video(
+    request: Request,
     file_id: str,
     language: str,
     target_ratio: str,
     position: float = 50,
-    volume: float = 100
+    volume: float = 100,
+    model: Optional[str] = None,
+    start: Optional[float] = None,
+    end: Optional[float] = None
 ):
+    validate_model_name(model)
+    
     # Find the uploaded file
-    input_files = list(UPLOAD_DIR.glob(f"{file_id}_*"))
-    if not input_files:
+    input_path = await asyncio.to_thread(find_upload, file_id)
+    if input_path is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    input_path = input_files[0]
+    media_info = await asyncio.to_thread(get_media_info, str(input_path))
+    validate_time_range(start, end, media_info["duration"])
+    
+    # Generate transcription in the transcription pool; a start/end range is
+    # transcribed on its own, with subtitle times relative to `start`. Whisper
+    # is stopped if the client goes away before it finishes.
+    cost = estimate_transcription_cost(media_info, model, start, end)
+    outcome = await run_until_disconnected(request, "transcribe", cost, transcribe_audio, str(input_path), language, model, None, start, end, file_id=file_id)
+    if outcome["status"] != "done":
+        raise HTTPException(status_code=outcome["status_code"], detail=outcome["error"]["message"])
     
     try:
-        # Generate transcription
-        result = transcribe_audio(str(input_path), language)
+        result = outcome["result"]
         
         # Create temporary SRT file
         temp_srt_path = TRANSCRIPTS_DIR / f"temp_{file_id}.srt"
@@ -528,7 +3501,10 @@ async def transcribe_video(
             "target_ratio": target_ratio,
             "position": position,
             "volume": volume,
-            "language": language
+            "language": language,
+            "model": model,
+            "start": start,
+            "end": end
         }
         
         return {
@@ -539,84 +3515,155 @@ async def transcribe_video(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/render/{file_id}")
-async def render_video_endpoint(
-    file_id: str,
-    render_data: dict = Body(...),
-):
-    """Render the video with optional subtitle customization."""
-    logger.info(f"Starting render for file_id: {file_id}")
-    logger.info(f"Render parameters: {render_data}")
+# Render cache
+#
+# A render is identified by the source content hash plus its canonicalized
+# parameters and encoder settings. The manifest in cache/renders records the
+# result (output and transcript files) of a finished render.
+def canonical_render_params(render_data: dict) -> dict:
+    """Reduce render parameters to the values that affect the output, normalized."""
+    target_ratio = render_data.get('target_ratio', '9:16')
+    language = render_data.get('language') or None
+    skip_edit = bool(render_data.get('skip_edit', True))
+    profile = render_data.get('profile') or DEFAULT_ENCODING_PROFILE
+    subtitle_styles = render_data.get('subtitle_styles') or {}
+    start, end = parse_time_range(render_data)
+    auto_crop = bool(render_data.get('auto_crop')) and target_ratio == "9:16"
+    params = {
+        "version": RENDER_CACHE_VERSION,
+        "start": round(start, 3) if start else None,
+        "end": round(end, 3) if end is not None else None,
+        "target_ratio": target_ratio,
+        # Position only moves the crop window of vertical renders
+        "position": round(float(render_data.get('position', 50)), 2) if target_ratio == "9:16" and not auto_crop else None,
+        "volume": round(float(render_data.get('volume', 100)), 2),
+        "language": language,
+        "model": (render_data.get('model') or WHISPER_MODEL_NAME) if language else None,
+        "srt_content": (render_data.get('srt_content') or None) if language and not skip_edit else None,
+        "skip_edit": skip_edit if language else None,
+        "subtitle_styles": {key: str(value) for key, value in sorted(subtitle_styles.items())} if language else None,
+        "profile": profile,
+        "encoding": ENCODING_PROFILES[profile],
+        "fragmented": bool(render_data.get('stream')),
+    }
+    if auto_crop:
+        # Only present for tracked crops, so keys of other renders stay the same
+        params["auto_crop"] = {
+            "sample_fps": AUTO_CROP_SAMPLE_FPS,
+            "analysis_width": AUTO_CROP_ANALYSIS_WIDTH,
+            "smoothing_seconds": AUTO_CROP_SMOOTHING_SECONDS,
+            "scene_threshold": AUTO_CROP_SCENE_THRESHOLD,
+            "max_points": AUTO_CROP_MAX_POINTS,
+        }
+    return params
+
+def get_render_cache_key(source_hash: str, render_data: dict) -> str:
+    canonical = json.dumps(canonical_render_params(render_data), sort_keys=True)
+    return hashlib.sha256(f"{source_hash}:{canonical}".encode()).hexdigest()[:32]
+
+def get_segment_store_key(source_hash: str, render_data: dict) -> str:
+    """Key of the stored segments of a render: its parameters except subtitle text and audio.
+
+    Renders that differ only in their (edited) subtitles share one segment
+    store; the manifest tells which segments still match.
+    """
+    params = canonical_render_params(render_data)
+    for key in ("language", "model", "srt_content", "skip_edit", "volume", "fragmented"):
+        params.pop(key)
+    canonical = json.dumps(params, sort_keys=True)
+    return hashlib.sha256(f"segments:{source_hash}:{canonical}".encode()).hexdigest()[:32]
+
+def load_cached_render(cache_key: str) -> Optional[dict]:
+    """Return the result of a finished identical render if all its files still exist."""
+    result = load_cached_json(RENDER_CACHE_DIR / f"{cache_key}.json")
+    if result is None:
+        return None
+    files = [result["output_file"], *result.get("transcript_files", {}).values()]
+    if not all(Path(path).exists() for path in files):
+        return None
+    # Bump the output's modification time so eviction keeps it
+    Path(result["output_file"]).touch()
+    return result
+
+def store_cached_render(cache_key: str, result: dict):
+    if store_cached_json(RENDER_CACHE_DIR / f"{cache_key}.json", result):
+        evict_lru_cache(OUTPUT_DIR, "render_*.mp4", RENDER_CACHE_MAX_BYTES)
+
+def generate_transcript_files(input_file: Path, language: str, model_name: Optional[str] = None, start: Optional[float] = None, end: Optional[float] = None) -> dict:
+    """Transcribe the input (or its start/end range) and write SRT and TXT transcript files for download."""
+    logger.info(f"Generating transcription files for language: {language}")
+    result = transcribe_audio(str(input_file), language, model_name, start=start, end=end)
+    
+    # Create SRT file
+    srt_path = TRANSCRIPTS_DIR / f"transcript_{uuid.uuid4()}.srt"
+    create_srt_file(result["segments"], srt_path)
+    
+    # Create TXT file
+    txt_path = TRANSCRIPTS_DIR / f"transcript_{uuid.uuid4()}.txt"
+    create_txt_file(result["segments"], txt_path)
+    
+    transcript_files = {"srt": str(srt_path), "txt": str(txt_path)}
+    logger.info(f"Generated transcript files: {transcript_files}")
+    return transcript_files
+
+def render_video(file_id: str, input_file: str, render_data: dict, cache_key: Optional[str] = None, segment_key: Optional[str] = None):
+    """Render job: transcribe (if requested) and crop with subtitle customization.
+
+    With a `cache_key` the output is written to a content-addressed file and the
+    result is recorded in the render cache. With a `segment_key` the render is
+    encoded incrementally from the segments in cache/segments/<segment_key>.
+    """
+    input_file = Path(input_file)
+    if not input_file.exists():
+        logger.error(f"Input file no longer exists: {input_file}")
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": "Video file was removed or is no longer accessible",
+                "error": f"File not found: {input_file}",
+                "can_retry": False
+            }
+        )
+    
+    # Generate output filename with UUID; cached renders are encoded to a
+    # partial file named after the job (so /jobs/{job_id}/stream can follow it)
+    # and only moved to their content-addressed name when complete
+    output_filename = f"partial_{current_job_id or uuid.uuid4()}.mp4" if cache_key else f"cropped_{uuid.uuid4()}.mp4"
+    output_file = OUTPUT_DIR / output_filename
+    logger.info(f"Output file will be: {output_file}")
+    
+    # Extract parameters from render_data
+    skip_edit = render_data.get('skip_edit', True)
+    srt_content = render_data.get('srt_content')
+    target_ratio = render_data.get('target_ratio', '9:16')
+    position = float(render_data.get('position', 50))
+    volume = float(render_data.get('volume', 100))
+    language = render_data.get('language')
+    model_name = render_data.get('model')
+    profile = render_data.get('profile')
+    subtitle_styles = render_data.get('subtitle_styles')
+    parallel = render_data.get('parallel')
+    start, end = parse_time_range(render_data)
+    stream = bool(render_data.get('stream'))
+    auto_crop = bool(render_data.get('auto_crop'))
+    
+    # Create temporary SRT file if content is provided
+    temp_srt = None
+    transcript_files = {}
     
     try:
-        # Find the uploaded file
-        input_files = list(UPLOAD_DIR.glob(f"{file_id}_*"))
-        logger.info(f"Found input files: {input_files}")
-        
-        if not input_files:
-            logger.error(f"No input files found for file_id: {file_id}")
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "message": "Video file not found",
-                    "error": f"No input file found for ID: {file_id}",
-                    "can_retry": False
-                }
-            )
-        
-        input_file = input_files[0]
-        if not input_file.exists():
-            logger.error(f"Input file no longer exists: {input_file}")
-            raise HTTPException(
-                status_code=404,
-                detail={
-                    "message": "Video file was removed or is no longer accessible",
-                    "error": f"File not found: {input_file}",
-                    "can_retry": False
-                }
-            )
-        
-        # Generate output filename with UUID
-        output_filename = f"cropped_{uuid.uuid4()}.mp4"
-        output_file = OUTPUT_DIR / output_filename
-        logger.info(f"Output file will be: {output_file}")
-        
-        # Extract parameters from render_data
-        skip_edit = render_data.get('skip_edit', True)
-        srt_content = render_data.get('srt_content')
-        target_ratio = render_data.get('target_ratio', '9:16')
-        position = float(render_data.get('position', 50))
-        volume = float(render_data.get('volume', 100))
-        language = render_data.get('language')
-        subtitle_styles = render_data.get('subtitle_styles')
-        
-        # Create temporary SRT file if content is provided
-        temp_srt = None
-        transcript_files = {}
-        
         # Always generate transcript files if language is specified
         if language:
             try:
-                logger.info(f"Generating transcription files for language: {language}")
-                result = transcribe_audio(str(input_file), language)
-                
-                # Create SRT file
-                srt_path = TRANSCRIPTS_DIR / f"transcript_{uuid.uuid4()}.srt"
-                create_srt_file(result["segments"], srt_path)
-                transcript_files["srt"] = str(srt_path)
-                
-                # Create TXT file
-                txt_path = TRANSCRIPTS_DIR / f"transcript_{uuid.uuid4()}.txt"
-                create_txt_file(result["segments"], txt_path)
-                transcript_files["txt"] = str(txt_path)
-                
-                logger.info(f"Generated transcript files: {transcript_files}")
+                transcript_files = generate_transcript_files(input_file, language, model_name, start, end)
                 
                 # If we have edited content, use it for burning subtitles
                 if not skip_edit and srt_content:
                     temp_srt = TRANSCRIPTS_DIR / f"temp_{uuid.uuid4()}.srt"
                     temp_srt.write_text(srt_content, encoding='utf-8')
                     logger.info(f"Created temporary SRT file for burning: {temp_srt}")
+            except JobCancelled:
+                raise
             except Exception as e:
                 logger.error(f"Failed to generate transcript files: {e}")
                 # Continue with video processing even if transcript generation fails
@@ -639,19 +3686,35 @@ async def render_video_endpoint(
                 volume=volume,
                 language=language,
                 burn_subtitles=bool(language and (skip_edit or srt_content)),
-                subtitle_styles=subtitle_styles
+                subtitle_styles=subtitle_styles,
+                model_name=model_name,
+                profile=profile,
+                parallel=parallel,
+                auto_crop=auto_crop,
+                start=start,
+                end=end,
+                fragmented=stream,
+                segment_store=SEGMENT_CACHE_DIR / segment_key if segment_key else None
             )
             
             if not output_file.exists():
                 raise FileNotFoundError("Output file was not created after processing")
+            
+            if cache_key:
+                cached_file = OUTPUT_DIR / f"render_{cache_key}.mp4"
+                os.replace(output_file, cached_file)
+                output_file = cached_file
                 
             logger.info(f"Successfully processed video: {output_file}")
             
-            return {
+            result = {
                 "output_file": str(output_file),
                 "transcript_files": transcript_files,
                 "message": "Video processed successfully"
             }
+            if cache_key:
+                store_cached_render(cache_key, result)
+            return result
             
         except subprocess.CalledProcessError as e:
             logger.error(f"FFmpeg process failed: {e.stderr}")
@@ -667,6 +3730,8 @@ async def render_video_endpoint(
                     }
                 }
             )
+        except (HTTPException, JobCancelled):
+            raise
         except Exception as e:
             logger.error(f"Error during video processing: {str(e)}")
             raise HTTPException(
@@ -677,24 +3742,458 @@ async def render_video_endpoint(
                     "can_retry": True
                 }
             )
-            
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error in render endpoint: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail={
-                "message": "An unexpected error occurred",
-                "error": str(e),
-                "can_retry": True
-            }
-        )
     finally:
         # Clean up temporary files
+        if cache_key and output_file.name.startswith("partial_") and output_file.exists():
+            output_file.unlink()
         if temp_srt and temp_srt.exists():
             try:
                 temp_srt.unlink()
                 logger.info(f"Cleaned up temporary SRT file: {temp_srt}")
             except Exception as e:
-                logger.warning(f"Could not clean up temporary SRT file: {e}") 
\ No newline at end of file
+                logger.warning(f"Could not clean up temporary SRT file: {e}")
+
+@app.post("/render/{file_id}")
+async def render_video_endpoint(
+    request: Request,
+    file_id: str,
+    render_data: dict = Body(...),
+):
+    """Queue a render of the video with optional subtitle customization.
+    
+    With `cancel_on_disconnect` (JOB_CANCEL_ON_DISCONNECT by default), the render
+    is cancelled once no client follows it.
+    """
+    logger.info(f"Starting render for file_id: {file_id}")
+    logger.info(f"Render parameters: {render_data}")
+    
+    validate_model_name(render_data.get('model'))
+    validate_encoding_profile(render_data.get('profile'))
+    render_data = {**render_data, **validate_crop_options(render_data)}
+    start, end = parse_time_range(render_data)
+    
+    # Find the uploaded file
+    input_file = await asyncio.to_thread(find_upload, file_id)
+    logger.info(f"Found input file: {input_file}")
+    
+    if input_file is None:
+        logger.error(f"No input files found for file_id: {file_id}")
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": "Video file not found",
+                "error": f"No input file found for ID: {file_id}",
+                "can_retry": False
+            }
+        )
+    
+    media_info = await asyncio.to_thread(get_media_info, str(input_file))
+    validate_time_range(start, end, media_info["duration"])
+    source_hash = await asyncio.to_thread(get_upload_hash, file_id, input_file)
+    cache_key = get_render_cache_key(source_hash, render_data)
+    
+    cached = load_cached_render(cache_key)
+    record_metric("render_cache_requests_total", 1, result="miss" if cached is None else "hit")
+    if cached is not None:
+        logger.info(f"Serving cached render {cache_key}")
+        job = complete_job("render", cached, file_id=file_id)
+    else:
+        # Subtitle renders keep their segments, so a render with edited
+        # subtitles only re-encodes the segments whose cues changed
+        segment_key = None
+        if RENDER_INCREMENTAL and render_data.get('language') and not render_data.get('stream'):
+            segment_key = get_segment_store_key(source_hash, render_data)
+        job = submit_job(
+            "render", render_video, file_id, str(input_file), render_data, cache_key, segment_key,
+            file_id=file_id, dedupe_key=f"render:{cache_key}",
+            cancel_on_disconnect=bool(render_data.get('cancel_on_disconnect', JOB_CANCEL_ON_DISCONNECT)),
+            client=client_id(request), cost=estimate_render_cost(media_info, [render_data], source_hash, incremental=segment_key is not None)
+        )
+        if render_data.get('stream'):
+            job["streamable"] = True
+    return JSONResponse(status_code=202, content={"job_id": job["job_id"], "status": job["status"]})
+
+def batch_output_render_data(batch_data: dict, output: dict) -> dict:
+    """Combine the shared batch parameters with one output spec."""
+    # Batch outputs are never streamed
+    shared = {key: value for key, value in batch_data.items() if key not in ('outputs', 'stream')}
+    return {**shared, **output}
+
+def batch_render_result(outputs: list, files: list, transcript_files: dict) -> dict:
+    return {
+        "outputs": [
+            {
+                "target_ratio": output.get('target_ratio', '9:16'),
+                "position": float(output.get('position', 50)),
+                "auto_crop": bool(output.get('auto_crop')),
+                "profile": output.get('profile') or DEFAULT_ENCODING_PROFILE,
+                "output_file": output_file,
+            }
+            for output, output_file in zip(outputs, files)
+        ],
+        "transcript_files": transcript_files,
+        "message": "Videos processed successfully"
+    }
+
+def render_video_batch(file_id: str, input_file: str, batch_data: dict, cache_keys: list):
+    """Batch render job: every output spec is cropped from a single decode of the input.
+
+    Outputs already in the render cache are reused, the rest are encoded
+    together and recorded in the render cache under their own keys.
+    """
+    input_file = Path(input_file)
+    if not input_file.exists():
+        logger.error(f"Input file no longer exists: {input_file}")
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": "Video file was removed or is no longer accessible",
+                "error": f"File not found: {input_file}",
+                "can_retry": False
+            }
+        )
+    
+    outputs = batch_data['outputs']
+    skip_edit = batch_data.get('skip_edit', True)
+    srt_content = batch_data.get('srt_content')
+    language = batch_data.get('language')
+    model_name = batch_data.get('model')
+    subtitle_styles = dict(batch_data.get('subtitle_styles') or {})
+    start, end = parse_time_range(batch_data)
+    if not skip_edit and srt_content:
+        subtitle_styles['srt_content'] = srt_content
+    
+    transcript_files = {}
+    if language:
+        try:
+            transcript_files = generate_transcript_files(input_file, language, model_name, start, end)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to generate transcript files: {e}")
+            logger.warning("Continuing with video processing despite transcript generation failure")
+    
+    # Identical specs within the batch share one branch
+    files = {}
+    pending = {}
+    for output, cache_key in zip(outputs, cache_keys):
+        if cache_key in files or cache_key in pending:
+            continue
+        cached = load_cached_render(cache_key)
+        if cached is not None:
+            files[cache_key] = cached["output_file"]
+        else:
+            pending[cache_key] = {
+                **output,
+                "auto_crop": bool(output.get('auto_crop', batch_data.get('auto_crop'))),
+                "output_path": OUTPUT_DIR / f"partial_{uuid.uuid4()}.mp4"
+            }
+    
+    logger.info(f"Batch render of {len(outputs)} outputs: {len(pending)} to encode, {len(files)} cached")
+    
+    try:
+        if pending:
+            crop_video_batch(
+                str(input_file),
+                list(pending.values()),
+                volume=float(batch_data.get('volume', 100)),
+                language=language,
+                burn_subtitles=bool(language and (skip_edit or srt_content)),
+                subtitle_styles=subtitle_styles,
+                model_name=model_name,
+                start=start,
+                end=end
+            )
+        
+        for cache_key, output in pending.items():
+            if not output["output_path"].exists():
+                raise HTTPException(
+                    status_code=500,
+                    detail={
+                        "message": "Failed to process video",
+                        "error": "Output file was not created after processing",
+                        "can_retry": True
+                    }
+                )
+            cached_file = OUTPUT_DIR / f"render_{cache_key}.mp4"
+            os.replace(output["output_path"], cached_file)
+            files[cache_key] = str(cached_file)
+            store_cached_render(cache_key, {
+                "output_file": str(cached_file),
+                "transcript_files": transcript_files,
+                "message": "Video processed successfully"
+            })
+    finally:
+        for output in pending.values():
+            if output["output_path"].exists():
+                output["output_path"].unlink()
+    
+    logger.info(f"Successfully processed batch for file_id: {file_id}")
+    return batch_render_result(outputs, [files[key] for key in cache_keys], transcript_files)
+
+@app.post("/render-batch/{file_id}")
+async def render_batch_endpoint(
+    request: Request,
+    file_id: str,
+    batch_data: dict = Body(...),
+):
+    """Queue one job that renders several aspect ratios/positions from a single decode.
+
+    `outputs` is a list of {target_ratio, position, auto_crop, profile} specs;
+    language, model, volume, subtitle_styles and srt_content apply to every output.
+    With `cancel_on_disconnect` (JOB_CANCEL_ON_DISCONNECT by default), the job
+    is cancelled once no client follows it.
+    """
+    logger.info(f"Starting batch render for file_id: {file_id}")
+    logger.info(f"Batch render parameters: {batch_data}")
+    
+    outputs = batch_data.get('outputs')
+    if not isinstance(outputs, list) or not outputs or len(outputs) > RENDER_BATCH_MAX_OUTPUTS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"Batch renders need between 1 and {RENDER_BATCH_MAX_OUTPUTS} outputs",
+                "error": "Invalid outputs",
+                "can_retry": False
+            }
+        )
+    validate_model_name(batch_data.get('model'))
+    for i, output in enumerate(outputs):
+        if not isinstance(output, dict):
+            raise HTTPException(status_code=400, detail=f"Output {i} must be an object")
+        outputs[i] = {**output, **validate_crop_options(batch_output_render_data(batch_data, output), f" for output {i}")}
+        validate_encoding_profile(output.get('profile'))
+    start, end = parse_time_range(batch_data)
+    
+    # Find the uploaded file
+    input_file = await asyncio.to_thread(find_upload, file_id)
+    if input_file is None:
+        logger.error(f"No input files found for file_id: {file_id}")
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "message": "Video file not found",
+                "error": f"No input file found for ID: {file_id}",
+                "can_retry": False
+            }
+        )
+    
+    media_info = await asyncio.to_thread(get_media_info, str(input_file))
+    validate_time_range(start, end, media_info["duration"])
+    source_hash = await asyncio.to_thread(get_upload_hash, file_id, input_file)
+    cache_keys = [get_render_cache_key(source_hash, batch_output_render_data(batch_data, output)) for output in outputs]
+    
+    cached = [load_cached_render(cache_key) for cache_key in cache_keys]
+    for result in cached:
+        record_metric("render_cache_requests_total", 1, result="miss" if result is None else "hit")
+    if all(result is not None for result in cached):
+        logger.info(f"Serving cached batch render for file_id: {file_id}")
+        result = batch_render_result(outputs, [result["output_file"] for result in cached], cached[0]["transcript_files"])
+        job = complete_job("render", result, file_id=file_id)
+    else:
+        batch_key = hashlib.sha256(":".join(cache_keys).encode()).hexdigest()[:32]
+        job = submit_job(
+            "render", render_video_batch, file_id, str(input_file), batch_data, cache_keys,
+            file_id=file_id, dedupe_key=f"render-batch:{batch_key}",
+            cancel_on_disconnect=bool(batch_data.get('cancel_on_disconnect', JOB_CANCEL_ON_DISCONNECT)),
+            client=client_id(request),
+            cost=estimate_render_cost(media_info, [batch_output_render_data(batch_data, output) for output in outputs], source_hash)
+        )
+    return JSONResponse(status_code=202, content={"job_id": job["job_id"], "status": job["status"]})
+
+# Previews
+#
+# Previews seek on the input side (-ss before -i), so ffmpeg jumps to the nearest
+# keyframe instead of decoding from the start, and only a frame or a few seconds
+# are processed at low resolution.
+PREVIEW_KINDS = ["frame", "filmstrip", "clip"]
+
+preview_cache = OrderedDict()
+preview_cache_bytes = 0
+preview_slots = asyncio.Semaphore(PREVIEW_CONCURRENCY)
+# (client, file_id, kind) -> token of the newest preview request waiting for or
+# holding a slot; older requests still waiting are dropped (slider drags)
+latest_previews = {}
+
+def get_cached_preview(key: str) -> Optional[tuple]:
+    if key not in preview_cache:
+        return None
+    preview_cache.move_to_end(key)
+    return preview_cache[key]
+
+def store_preview(key: str, content: bytes, media_type: str):
+    global preview_cache_bytes
+    preview_cache[key] = (content, media_type)
+    preview_cache_bytes += len(content)
+    while preview_cache_bytes > PREVIEW_CACHE_MAX_BYTES and len(preview_cache) > 1:
+        _, (evicted, _) = preview_cache.popitem(last=False)
+        preview_cache_bytes -= len(evicted)
+
+def preview_subtitle_cues(preview_data: dict, start: float) -> list:
+    """Cues to burn into a preview starting at `start` seconds.
+
+    `srt_content` is shown with its real timing; `subtitle_text` is a sample line
+    shown for the whole preview, to try out a subtitle style.
+    """
+    if preview_data.get('srt_content'):
+        return shift_cues(parse_srt(preview_data['srt_content']), int(start * 1000))
+    if preview_data.get('subtitle_text'):
+        return [(0, 24 * 3600 * 1000, preview_data['subtitle_text'])]
+    return []
+
+def render_preview(input_path: str, preview_data: dict) -> tuple:
+    """Produce preview bytes and their media type with a single fast-seeking ffmpeg run."""
+    media_info = get_media_info(input_path)
+    kind = preview_data.get('kind', 'frame')
+    duration = media_info["duration"]
+    start = min(max(float(preview_data.get('time', 0)), 0), max(duration - 0.1, 0))
+    subtitle_styles = preview_data.get('subtitle_styles') or {}
+    
+    crop = compute_crop(
+        media_info["width"],
+        media_info["height"],
+        preview_data.get('target_ratio', '9:16'),
+        float(preview_data.get('position', 50))
+    )
+    new_width, new_height = crop[:2]
+    pieces = subject_crop_pieces(input_path, crop) if preview_data.get('auto_crop') else None
+    
+    # A filmstrip shows frames from all over the video, so only sample text fits it
+    cues = preview_subtitle_cues(
+        preview_data if kind != "filmstrip" else {"subtitle_text": preview_data.get('subtitle_text')},
+        start
+    )
+    ass_path = None
+    if cues:
+        ass_path = write_ass_file(cues, new_width, new_height, subtitle_styles)
+    video_filter = build_video_filter(subject_crop(crop, pieces, start), ass_path, {"max_height": None})
+    
+    if kind == "filmstrip":
+        frame_count = min(max(int(preview_data.get('frames', 8)), 1), PREVIEW_MAX_FRAMES)
+        cmd = ["ffmpeg", "-v", "error"]
+        filters = []
+        for i in range(frame_count):
+            frame_time = duration * (i + 0.5) / frame_count
+            cmd += ["-ss", f"{frame_time:.3f}", "-i", input_path]
+            # With auto_crop each frame is cropped where the path is at its own time
+            frame_filter = build_video_filter(subject_crop(crop, pieces, frame_time, 1), ass_path, {"max_height": None})
+            filters.append(f"[{i}:v]{frame_filter},scale=-2:{min(PREVIEW_FILMSTRIP_HEIGHT, new_height)},trim=end_frame=1,setpts=PTS-STARTPTS[f{i}]")
+        inputs = "".join(f"[f{i}]" for i in range(frame_count))
+        filters.append(f"{inputs}hstack=inputs={frame_count}[out]" if frame_count > 1 else "[f0]null[out]")
+        cmd += [
+            "-filter_complex", ";".join(filters),
+            "-map", "[out]",
+            "-frames:v", "1",
+            "-q:v", "4",
+            "-f", "image2pipe",
+            "-c:v", "mjpeg",
+            "pipe:1"
+        ]
+        media_type = "image/jpeg"
+    elif kind == "clip":
+        clip_duration = min(max(float(preview_data.get('duration', 3)), 0.5), PREVIEW_MAX_CLIP_SECONDS)
+        volume = float(preview_data.get('volume', 100))
+        video_filter += f",scale=-2:{min(PREVIEW_HEIGHT, new_height)}"
+        cmd = [
+            "ffmpeg", "-v", "error",
+            "-ss", f"{start:.3f}",
+            "-t", f"{clip_duration:.3f}",
+            "-i", input_path,
+            "-vf", video_filter,
+            "-c:v", "libx264",
+            "-preset", "ultrafast",
+            "-crf", "32",
+            "-pix_fmt", "yuv420p"
+        ]
+        if media_info["has_audio"]:
+            cmd += ["-af", f"volume={volume / 100}", "-c:a", "aac", "-b:a", "64k"]
+        else:
+            cmd.append("-an")
+        # Fragmented MP4 can be written to a pipe
+        cmd += ["-movflags", "frag_keyframe+empty_moov", "-f", "mp4", "pipe:1"]
+        media_type = "video/mp4"
+    else:
+        video_filter += f",scale=-2:{min(PREVIEW_HEIGHT, new_height)}"
+        cmd = [
+            "ffmpeg", "-v", "error",
+            "-ss", f"{start:.3f}",
+            "-i", input_path,
+            "-vf", video_filter,
+            "-frames:v", "1",
+            "-q:v", "4",
+            "-f", "image2pipe",
+            "-c:v", "mjpeg",
+            "pipe:1"
+        ]
+        media_type = "image/jpeg"
+    
+    try:
+        logger.info(f"Running preview command: {' '.join(cmd)}")
+        result = run_process(cmd, "previewing", PREVIEW_TIMEOUT)
+    finally:
+        if ass_path and ass_path.exists():
+            ass_path.unlink()
+    
+    if result.returncode != 0 or not result.stdout:
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "message": "Failed to generate preview",
+                "error": result.stderr,
+                "can_retry": True
+            }
+        )
+    return result.stdout, media_type
+
+@app.post("/preview/{file_id}")
+async def preview_video(request: Request, file_id: str, preview_data: dict = Body(...)):
+    """Return a cropped JPEG frame, a filmstrip sprite or a short proxy clip.
+    
+    An auto_crop preview of an upload that has not been analyzed yet answers
+    202 with the id of the analysis job; retry once that job is done.
+    """
+    if preview_data.get('kind', 'frame') not in PREVIEW_KINDS:
+        raise HTTPException(status_code=400, detail=f"Kind must be one of: {', '.join(PREVIEW_KINDS)}")
+    if preview_data.get('target_ratio', '9:16') not in ["9:16", "16:9"]:
+        raise HTTPException(status_code=400, detail="Invalid aspect ratio")
+    
+    # Find the uploaded file
+    input_path = await asyncio.to_thread(find_upload, file_id)
+    if input_path is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    key = json.dumps([str(input_path), input_path.stat().st_mtime_ns, preview_data], sort_keys=True)
+    cached = get_cached_preview(key)
+    if cached is None:
+        if preview_data.get('auto_crop'):
+            # Subject analysis decodes the whole upload, so it runs as an
+            # admitted job (shared by concurrent previews), not in this request
+            source_hash = await asyncio.to_thread(get_upload_hash, file_id, input_path)
+            if not get_subject_cache_path(source_hash).exists():
+                media_info = await asyncio.to_thread(get_media_info, str(input_path))
+                job = submit_job(
+                    "render", prepare_subject_analysis, str(input_path),
+                    file_id=file_id, dedupe_key=f"subjects:{source_hash}",
+                    client=client_id(request), cost=estimate_subject_analysis_cost(media_info)
+                )
+                reservation = admitted_jobs.get(job["job_id"])
+                retry_after = max(1, round(remaining_work(reservation))) if reservation else 1
+                return JSONResponse(
+                    status_code=202,
+                    content={"job_id": job["job_id"], "status": job["status"]},
+                    headers={"Retry-After": str(retry_after)}
+                )
+        preview_key = (client_id(request), file_id, preview_data.get('kind', 'frame'))
+        token = object()
+        latest_previews[preview_key] = token
+        try:
+            async with preview_slots:
+                if latest_previews.get(preview_key) is not token or await request.is_disconnected():
+                    raise HTTPException(status_code=409, detail="Superseded by a newer preview request")
+                cached = await asyncio.to_thread(render_preview, str(input_path), preview_data)
+        finally:
+            if latest_previews.get(preview_key) is token:
+                del latest_previews[preview_key]
+        store_preview(key, *cached)
+    content, media_type = cached
+    return Response(content=content, media_type=media_type, headers={"Cache-Control": "private, max-age=300"})
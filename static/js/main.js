@@ -113,6 +113,14 @@ window.updateCropPreview = (position) => {
   const cropFrame = document.getElementById("crop-preview");
   cropFrame.style.width = `${previewWidth}%`;
   cropFrame.style.left = `${previewOffset}%`;
+
+  if (currentFileId) {
+    videoProcessing.loadCropPreview(
+      currentFileId,
+      position,
+      videoPreview.currentTime || 0
+    );
+  }
 };
 
 window.processVideoWithPosition = async () => {
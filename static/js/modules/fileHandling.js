@@ -9,18 +9,8 @@ export async function handleFiles(files, videoPreview) {
     return;
   }
 
-  const formData = new FormData();
-  formData.append("file", file);
-
   try {
-    const response = await fetch("/upload", {
-      method: "POST",
-      body: formData,
-    });
-
-    if (!response.ok) throw new Error("Upload failed");
-
-    const data = await response.json();
+    const data = await uploadInChunks(file);
     const currentFileId = data.file_id;
     const originalWidth = data.dimensions.width;
     const originalHeight = data.dimensions.height;
@@ -41,6 +31,64 @@ export async function handleFiles(files, videoPreview) {
   }
 }
 
+const MAX_CHUNK_RETRIES = 5;
+
+async function uploadInChunks(file) {
+  const initResponse = await fetch("/upload/init", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({
+      filename: file.name,
+      content_type: file.type,
+      size: file.size,
+    }),
+  });
+  if (!initResponse.ok) throw new Error("Upload failed");
+
+  let { file_id: fileId, offset, chunk_size: chunkSize } =
+    await initResponse.json();
+  // Send several server-sized chunks per request to keep request overhead low
+  chunkSize *= 8;
+  let retries = 0;
+
+  while (offset < file.size) {
+    const progress = Math.floor((offset / file.size) * 100);
+    document.getElementById(
+      "drop-zone-text"
+    ).textContent = `Uploading... ${progress}%`;
+
+    try {
+      const response = await fetch(`/upload/${fileId}?offset=${offset}`, {
+        method: "PUT",
+        body: file.slice(offset, offset + chunkSize),
+      });
+      if (!response.ok && response.status !== 409) {
+        throw new Error("Chunk upload failed");
+      }
+      // On 409 the server tells us where to resume from
+      const data = await response.json();
+      offset = response.ok ? data.offset : data.detail.offset;
+      retries = 0;
+    } catch (error) {
+      if (++retries > MAX_CHUNK_RETRIES) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+      // Ask the server how much arrived before the connection dropped
+      const statusResponse = await fetch(`/upload/${fileId}`);
+      if (statusResponse.ok) {
+        offset = (await statusResponse.json()).offset;
+      }
+    }
+  }
+
+  const completeResponse = await fetch(`/upload/${fileId}/complete`, {
+    method: "POST",
+  });
+  if (!completeResponse.ok) throw new Error("Upload failed");
+  return await completeResponse.json();
+}
+
 export async function downloadFile(fileUrl, fileName, currentFileId) {
   try {
     const response = await fetch(`/download/${fileUrl.split("/").pop()}`);
@@ -6,6 +6,7 @@ export async function processVideoWithPosition(currentFileId) {
   const position = document.getElementById("crop-position").value;
   const volume = document.getElementById("volume-slider").value;
   const language = document.getElementById("language-select").value;
+  const model = document.getElementById("model-select").value;
   const shouldBurnSubtitles = document.getElementById("burn-subtitles").checked;
 
   // Hide processing section and show progress
@@ -17,7 +18,7 @@ export async function processVideoWithPosition(currentFileId) {
     if (shouldBurnSubtitles && language) {
       // First step: Generate transcription
       const transcribeResponse = await fetch(
-        `/transcribe/${currentFileId}?language=${language}&target_ratio=9:16&position=${position}&volume=${volume}`,
+        `/transcribe/${currentFileId}?language=${language}&target_ratio=9:16&position=${position}&volume=${volume}&model=${model}`,
         {
           method: "POST",
         }
@@ -25,7 +26,9 @@ export async function processVideoWithPosition(currentFileId) {
 
       if (!transcribeResponse.ok) {
         const errorData = await transcribeResponse.json();
-        throw new Error(errorData.detail || "Transcription failed");
+        throw new Error(
+          errorData.detail.message || errorData.detail || "Transcription failed"
+        );
       }
 
       const transcribeData = await transcribeResponse.json();
@@ -57,6 +60,41 @@ export async function processVideoWithPosition(currentFileId) {
   }
 }
 
+let previewTimer = null;
+let previewUrl = null;
+
+// Fetch a cropped frame at the current playback time. Calls are debounced so
+// dragging the position slider only requests the frame where it stops.
+export function loadCropPreview(currentFileId, position, time, delay = 250) {
+  clearTimeout(previewTimer);
+  previewTimer = setTimeout(async () => {
+    try {
+      const response = await fetch(`/preview/${currentFileId}`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+          kind: "frame",
+          target_ratio: "9:16",
+          position: Number(position),
+          time: Math.round(time * 10) / 10,
+        }),
+      });
+      if (!response.ok) return;
+
+      const image = document.getElementById("crop-preview-image");
+      if (previewUrl) URL.revokeObjectURL(previewUrl);
+      previewUrl = URL.createObjectURL(await response.blob());
+      image.src = previewUrl;
+      image.classList.remove("hidden");
+    } catch (error) {
+      // Previews are best-effort; the overlay on the video still shows the crop
+      console.error("Preview error:", error);
+    }
+  }, delay);
+}
+
 export async function renderWithSubtitles(
   skipEdit,
   currentFileId,
@@ -73,6 +111,7 @@ export async function renderWithSubtitles(
       position: document.getElementById("crop-position").value,
       volume: document.getElementById("volume-slider").value,
       language: document.getElementById("language-select").value,
+      model: document.getElementById("model-select").value,
     };
 
     const renderData = {
@@ -81,6 +120,9 @@ export async function renderWithSubtitles(
         ? null
         : document.getElementById("subtitle-text").value,
       subtitle_styles: getSubtitleStyles(),
+      profile: document.getElementById("profile-select").value,
+      // Stop the render if this page goes away before it finishes
+      cancel_on_disconnect: true,
       ...params,
     };
 
@@ -101,7 +143,8 @@ export async function renderWithSubtitles(
       };
     }
 
-    const responseData = await renderResponse.json();
+    const { job_id: jobId } = await renderResponse.json();
+    const responseData = await watchJob(jobId);
 
     // Hide progress and show download section
     document.getElementById("progress-section").classList.add("hidden");
@@ -135,6 +178,89 @@ export async function renderWithSubtitles(
   }
 }
 
+const STAGE_LABELS = {
+  extracting_audio: "Extracting audio",
+  transcribing: "Transcribing",
+  encoding: "Encoding video",
+};
+
+function showJobProgress(job) {
+  const progressBar = document.getElementById("progress-bar");
+  const progressText = document.getElementById("progress-text");
+
+  if (job.status === "queued") {
+    progressBar.style.width = "0%";
+    progressText.textContent = "Waiting in queue...";
+    return;
+  }
+  if (!job.progress) {
+    progressText.textContent = "Processing video...";
+    return;
+  }
+
+  const { stage, percent, eta, fps } = job.progress;
+  progressBar.style.width = `${percent}%`;
+  let text = `${STAGE_LABELS[stage] || "Processing video"}... ${Math.floor(
+    percent
+  )}%`;
+  if (fps) text += ` (${Math.round(fps)} fps)`;
+  if (eta) text += ` - about ${Math.ceil(eta)}s left`;
+  progressText.textContent = text;
+}
+
+function jobFailure(job) {
+  return {
+    message: job.error.message || "Video processing failed",
+    technical: job.error.technical_details,
+    canRetry: job.error.can_retry,
+  };
+}
+
+// Follow a job over Server-Sent Events, falling back to polling if the
+// stream can't be established or drops before the job finishes.
+export function watchJob(jobId) {
+  return new Promise((resolve, reject) => {
+    const events = new EventSource(`/jobs/${jobId}/events`);
+
+    events.onmessage = (event) => {
+      const job = JSON.parse(event.data);
+      showJobProgress(job);
+      if (job.status === "done") {
+        events.close();
+        resolve(job.result);
+      } else if (job.status === "failed" || job.status === "cancelled") {
+        events.close();
+        reject(jobFailure(job));
+      }
+    };
+
+    events.onerror = () => {
+      events.close();
+      waitForJob(jobId).then(resolve, reject);
+    };
+  });
+}
+
+export async function waitForJob(jobId, pollInterval = 1000) {
+  while (true) {
+    const response = await fetch(`/jobs/${jobId}`);
+    if (!response.ok) {
+      throw { message: "Lost track of the processing job", canRetry: true };
+    }
+
+    const job = await response.json();
+    if (job.status === "done") {
+      return job.result;
+    }
+    if (job.status === "failed" || job.status === "cancelled") {
+      throw jobFailure(job);
+    }
+
+    showJobProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, pollInterval));
+  }
+}
+
 function updateDownloadButtons(outputFile, transcriptFiles, currentFileId) {
   // Video download button
   const videoBtn = document.getElementById("download-video-btn");
@@ -0,0 +1,26 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    # main creates its working directories and mounts static/ relative to the
+    # current directory, so import it from a scratch directory
+    workdir = tmp_path_factory.mktemp("app")
+    for name in ("static", "templates"):
+        (workdir / name).symlink_to(ROOT / name)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    try:
+        import main
+        yield main
+        main.shutdown_job_pools()
+    finally:
+        sys.path.remove(str(ROOT))
+        os.chdir(cwd)
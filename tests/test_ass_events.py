@@ -0,0 +1,95 @@
+"""ASS events written by create_ass_events must match ffmpeg's SRT -> ASS conversion.
+
+Burned-in subtitles used to go through `ffmpeg -i x.srt x.ass`; the Dialogue
+lines we now generate in Python have to come out byte for byte the same.
+"""
+import random
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg is not installed")
+
+
+def srt_timestamp(ms: int) -> str:
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def build_srt(cues) -> str:
+    return "".join(
+        f"{index}\n{srt_timestamp(start)} --> {srt_timestamp(end)}\n{text}\n\n"
+        for index, (start, end, text) in enumerate(cues, 1)
+    )
+
+
+def ffmpeg_dialogues(srt: str, tmp_path: Path) -> list:
+    srt_path = tmp_path / "x.srt"
+    ass_path = tmp_path / "x.ass"
+    srt_path.write_text(srt, encoding="utf-8")
+    subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", str(srt_path), str(ass_path)], check=True)
+    return [line for line in ass_path.read_text(encoding="utf-8").splitlines() if line.startswith("Dialogue:")]
+
+
+def our_dialogues(main, srt: str) -> list:
+    return main.create_ass_events(main.parse_srt(srt)).splitlines()
+
+
+def test_random_timings(main, tmp_path):
+    rng = random.Random(20240501)
+    cues = []
+    start = 0
+    for index in range(400):
+        # Millisecond-level starts and durations exercise the centisecond rounding
+        start += rng.randint(0, 4000)
+        cues.append((start, start + rng.randint(1, 6000), f"Segment {index}"))
+    srt = build_srt(cues)
+    assert our_dialogues(main, srt) == ffmpeg_dialogues(srt, tmp_path)
+
+
+def test_hour_rollover(main, tmp_path):
+    cues = [
+        (3599994, 3600004, "just before the hour"),
+        (3599995, 3601005, "rounds up to the hour"),
+        (3600005, 3661999, "after the hour"),
+        (35999000, 36000994, "past the largest ASS timestamp"),
+        (36001000, 36002000, "starts past it"),
+    ]
+    srt = build_srt(cues)
+    assert our_dialogues(main, srt) == ffmpeg_dialogues(srt, tmp_path)
+
+
+@pytest.mark.parametrize("text", [
+    "Braces {like this} and a {\\an8} override",
+    "Backslashes \\N and \\h stay as written",
+    "<i>italic</i>, <b>bold</b>, <u>underlined</u> and <s>struck</s>",
+    "<I>upper case</I> tags",
+    '<font color="#FF8000">orange</font> and <font color=00ff00>green</font>',
+    "two\nlines",
+    "three\nlines\nof text",
+    "<i>italic\nacross lines</i>",
+    "  padded with spaces   ",
+])
+def test_markup(main, tmp_path, text):
+    srt = build_srt([(1000, 2500, text), (3000, 4000, "next")])
+    assert our_dialogues(main, srt) == ffmpeg_dialogues(srt, tmp_path)
+
+
+def test_invalid_durations(main, tmp_path):
+    cues = [
+        (5000, 5000, "zero duration"),
+        (6000, 5500, "negative, runs until the next cue"),
+        (8000, 9000, "regular"),
+        (10000, 9500, "negative and last"),
+    ]
+    srt = build_srt(cues)
+    assert our_dialogues(main, srt) == ffmpeg_dialogues(srt, tmp_path)
+
+
+def test_unordered_cues(main, tmp_path):
+    srt = build_srt([(5000, 6000, "second"), (1000, 2000, "first"), (5000, 5500, "same start")])
+    assert our_dialogues(main, srt) == ffmpeg_dialogues(srt, tmp_path)
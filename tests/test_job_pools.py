@@ -0,0 +1,35 @@
+"""A worker that dies must not leave its job pool broken for later jobs."""
+import asyncio
+import os
+
+
+async def wait_until_finished(main, job):
+    while job["status"] not in main.FINISHED_JOB_STATUSES:
+        await asyncio.sleep(0.05)
+    return job
+
+
+def test_pool_recovers_after_worker_dies(main):
+    async def scenario():
+        # os._exit kills the worker outright, like the OOM killer would
+        crashed = await wait_until_finished(main, main.submit_job("render", os._exit, 1))
+        assert crashed["status"] == "failed"
+        assert "render" not in main.job_pools
+        
+        job = await wait_until_finished(main, main.submit_job("render", main.warm_up_worker))
+        assert job["status"] == "done", job["error"]
+        assert job["result"] != os.getpid()
+    
+    asyncio.run(scenario())
+
+
+def test_request_recovers_after_worker_dies(main):
+    async def scenario():
+        crashed = await main.run_admitted({"job_id": "request-crash", "kind": "transcribe", "status": "queued"}, os._exit, 1)
+        assert crashed["status"] == "failed"
+        assert crashed["status_code"] == 500
+        
+        outcome = await main.run_admitted({"job_id": "request-next", "kind": "transcribe", "status": "queued"}, main.warm_up_worker)
+        assert outcome["status"] == "done"
+    
+    asyncio.run(scenario())
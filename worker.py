@@ -0,0 +1,13 @@
+"""Preloaded by the fork server that starts the job workers.
+
+The API process (main.py) never imports Whisper or torch, so it starts quickly
+and stays small. Its job pools start their workers from a multiprocessing fork
+server that imports this module once: Whisper, torch and the application code
+are loaded a single time there, and every worker forked from it starts with
+them already imported, sharing those pages instead of loading its own copy.
+
+See WORKER_START_METHOD in main.py.
+"""
+import whisper  # noqa: F401 (imports torch)
+
+import main  # noqa: F401